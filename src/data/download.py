@@ -0,0 +1,468 @@
+"""
+외부 API에서 센서 데이터를 받아오는 비동기 downloader 입니다.
+
+    하나의 aiohttp.ClientSession을 공유해 연결을 재사용하고,
+    asyncio.Semaphore로 동시에 보내는 요청 수를 제한하며,
+    실패한 요청은 지수적으로 늘어나는 간격으로 retries번까지 다시 보냅니다.
+
+backfill은 받기, 파싱, 저장을 pipeline.py로 겹쳐 실행합니다.
+base_url을 바꿔 로컬 테스트 서버로 보낼 수 있습니다.
+"""
+import os
+import re
+import json
+import asyncio
+from datetime import datetime, timedelta
+import aiohttp
+import numpy as np
+import pandas as pd
+from src.sensor import Sensor
+from src.data.pipeline import Pipeline, Stage
+
+
+KMA_URL = "https://apihub.kma.go.kr/api/typ01/cgi-bin/url/nph-aws2_min"
+SEOUL_URL = "http://openapi.seoul.go.kr:8088"
+SEWER_SERVICE = "DrainpipeMonitoringInfo"
+# 구 번호 01 ~ 25
+SEWER_AREAS = [str(i + 1).zfill(2) for i in range(25)]
+SEWER_PAGE_ROWS = 1000
+SEWER_CHECKPOINT = 'download_checkpoint.json'
+SEWER_BUFFER_ROWS = 1 << 20
+# 서울 열린데이터 api의 RESULT.CODE, 정상 / 해당하는 데이터 없음
+SEWER_OK = 'INFO-000'
+SEWER_EMPTY = 'INFO-200'
+# 다시 보내면 될 수 있는 서버 오류 (ERROR-500 서버 오류, ERROR-600 데이터베이스 연결 오류)
+SEWER_RETRY_CODES = ('ERROR-500', 'ERROR-600')
+RAINFALL_COLUMNS = ['WD1', 'WS1', 'WDS', 'WSS', 'WD10', 'WS10', 'TA', 'RE', 'RN-15m', 'RN-60m', 'RN-12H', 'RN-DAY', 'HM', 'PA', 'PS', 'TD']
+# 음수면 관측이 없는 값으로 보고 NaN으로 바꿉니다.
+RAINFALL_MASKED = ['RE', 'RN-15m', 'RN-60m', 'RN-12H', 'RN-DAY']
+# 서울 강수량계 센서(tools/seoul.py)의 1분 강수량 열, concat_road_rainfall과 학습 코드는 이 열만 읽습니다.
+RAINFALL_COLUMN = '1분 누적강수량(mm)'
+
+CONCURRENCY = 8
+RETRIES = 5
+BACKOFF = 1.0
+TIMEOUT = 30
+BACKFILL_ROWS = 200_000
+
+
+async def fetch(session: aiohttp.ClientSession, url, semaphore: asyncio.Semaphore, params=None, json=False,
+                retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT, validate=None, parse=None):
+    '''
+    url을 GET 해서 본문(json이면 파싱한 객체)을 반환합니다. parse가 있으면 parse(본문)을 반환합니다.
+    연결 오류, 시간 초과, 5xx 응답, validate(본문)나 parse(본문)가 올린 ValueError는 backoff * 2 ** 시도횟수 초 뒤에 다시 보내고,
+    retries번 실패하면 예외를 올립니다.
+    '''
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    response.raise_for_status()
+                    if json:
+                        body = await response.json(content_type=None)
+                    else:
+                        body = (await response.read()).decode('utf-8')
+            if validate is not None:
+                validate(body)
+            return body if parse is None else parse(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                raise
+            if attempt == retries:
+                raise
+            print(f"Error at {url}: {e}, retrying {attempt + 1}")
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+
+def parse_rainfall(text):
+    '''
+    기상청 nph-aws2_min 응답(disp=1, help=2)을 열 단위 numpy 배열로 바로 변환합니다.
+    각 줄은 'YYYYMMDDHHMM,STN,값 16개,=' 입니다.
+    '''
+    lines = [line for line in text.splitlines() if line.strip() and not line.startswith('#')]
+    if not lines:
+        return pd.DataFrame({'time': np.array([], dtype='datetime64[ns]'),
+                             **{col: np.array([], dtype=np.float64) for col in RAINFALL_COLUMNS}})
+
+    fields = np.array([line.split(',')[:2 + len(RAINFALL_COLUMNS)] for line in lines])
+    value = {'time': pd.to_datetime(np.char.strip(fields[:, 0]), format='%Y%m%d%H%M').to_numpy(dtype='datetime64[ns]')}
+    numbers = np.char.strip(fields[:, 2:]).astype(np.float64)
+    for i, col in enumerate(RAINFALL_COLUMNS):
+        value[col] = numbers[:, i]
+        if col in RAINFALL_MASKED:
+            value[col][value[col] < 0] = np.nan
+    return pd.DataFrame(value, copy=False)
+
+
+def rainfall_per_minute(value):
+    '''
+    download_rainfall 결과의 RN-DAY(일 누적 강수량)와 앞 행의 차이로 RAINFALL_COLUMN(1분 강수량)을 구합니다.
+    RN-DAY가 줄어든 행(하루가 바뀌어 다시 셈)은 RN-DAY 값 자체가 그 사이의 강수량입니다.
+    첫 행은 앞 값이 없어 NaN 이므로, 이어 받을 때는 1분 앞부터 받아 계산한 뒤 첫 행을 버리세요.
+    '''
+    total = value['RN-DAY']
+    diff = total.diff()
+    return diff.mask(diff < 0, total).round(1)
+
+
+def rainfall_windows(start, end, freq='12h'):
+    '''
+    [start, end) 를 기상청 api가 한 번에 줄 수 있는 12시간 구간의 (tm1, tm2) 문자열로 나눕니다. tm2는 포함입니다.
+    '''
+    start = pd.to_datetime(start, format='%Y%m%d%H%M')
+    end = pd.to_datetime(end, format='%Y%m%d%H%M')
+    date_range = pd.date_range(start=start, end=end, freq=freq)
+    if date_range[-1] != end:
+        date_range = date_range.append(pd.Index([end]))
+    return [(date_range[i].strftime('%Y%m%d%H%M'), (date_range[i + 1] - pd.Timedelta(minutes=1)).strftime('%Y%m%d%H%M'))
+            for i in range(len(date_range) - 1)]
+
+
+async def download_rainfall_async(authKey, start="202208080000", end="202208160000", stn="401", base_url=KMA_URL,
+                                  concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF, session=None, semaphore=None):
+    '''
+    기상청 api로 start <= time < end 의 1분 AWS 자료를 받습니다. 12시간 구간들을 동시에 최대 concurrency개 요청합니다.
+
+    Args
+    ----
+    start, end : str
+        'YYYYMMDDHHMM' 형식
+    stn : str
+        기상청 지점 번호
+    base_url : str
+        api 주소, 테스트 서버로 바꿀 수 있습니다
+    session : aiohttp.ClientSession
+        여러 지점을 받을 때 공유할 session, None이면 새로 만듭니다
+    semaphore : asyncio.Semaphore
+        session과 함께 공유할 semaphore, None이면 concurrency로 새로 만듭니다.
+        session을 공유하면서 지점마다 semaphore를 따로 만들면 지점 수 * concurrency개의 요청이
+        session의 연결을 기다리다 시간 초과로 실패하므로 같이 넘기세요
+    '''
+    semaphore = asyncio.Semaphore(concurrency) if semaphore is None else semaphore
+
+    async def download(session):
+        tasks = [fetch(session, base_url, semaphore, retries=retries, backoff=backoff,
+                       params={'tm1': tm1, 'tm2': tm2, 'stn': stn, 'disp': '1', 'help': '2', 'authKey': authKey})
+                 for tm1, tm2 in rainfall_windows(start, end)]
+        return [parse_rainfall(text) for text in await asyncio.gather(*tasks)]
+
+    if session is None:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            dfs = await download(session)
+    else:
+        dfs = await download(session)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def download_rainfall(*args, **kwargs):
+    return asyncio.run(download_rainfall_async(*args, **kwargs))
+
+
+async def backfill_rainfall_async(dir, authKey, stns, start, end, base_url=KMA_URL, concurrency=CONCURRENCY,
+                                  retries=RETRIES, backoff=BACKOFF, make_meta=None, batch_rows=BACKFILL_ROWS):
+    '''
+    여러 지점의 start <= time < end 자료를 받아 {dir}/{stn} 센서에 append 합니다.
+    받기(fetch) -> 파싱(parse) -> 저장(persist)을 pipeline.Pipeline으로 겹쳐 실행하므로
+    네트워크 대기, 파싱, 디스크 쓰기가 동시에 진행됩니다.
+
+    Args
+    ----
+    stns : list[str]
+        기상청 지점 번호
+    start, end : str
+        'YYYYMMDDHHMM' 형식
+    make_meta : callable
+        make_meta(stn) -> 새 센서의 meta, None이면 강수량계 기본값
+    batch_rows : int
+        지점별로 이만큼 모이면 한 번에 append 합니다
+
+    Returns
+    -------
+    append한 Sensor 리스트
+    '''
+    if make_meta is None:
+        make_meta = lambda stn: {'location': f'기상청 AWS {stn}', 'category': '강수량계', 'id': stn}
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: dict[str, list[pd.DataFrame]] = {}
+    sensors: dict[str, Sensor] = {}
+
+    def write(stn):
+        value = pd.concat(pending.pop(stn), ignore_index=True)
+        sensor = sensors.get(stn) or Sensor(make_meta(stn), path=os.path.join(dir, stn))
+        sensor.append(value, keep='last')
+        sensors[stn] = sensor
+
+    def parse(item):
+        stn, text = item
+        return stn, parse_rainfall(text)
+
+    def persist(item):
+        stn, value = item
+        pending.setdefault(stn, []).append(value)
+        if sum(len(df) for df in pending[stn]) >= batch_rows:
+            write(stn)
+
+    def flush():
+        for stn in list(pending):
+            write(stn)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def fetch_window(item):
+            stn, tm1, tm2 = item
+            return stn, await fetch(session, base_url, semaphore, retries=retries, backoff=backoff,
+                                    params={'tm1': tm1, 'tm2': tm2, 'stn': stn, 'disp': '1', 'help': '2', 'authKey': authKey})
+
+        pipeline = Pipeline([
+            Stage('fetch', fetch_window, workers=concurrency),
+            Stage('parse', parse, workers=2, thread=True),
+            Stage('persist', persist, thread=True, flush=flush),
+        ])
+        await pipeline.run((str(stn), tm1, tm2) for stn in stns for tm1, tm2 in rainfall_windows(start, end))
+    print(pipeline.stats())
+
+    for sensor in sensors.values():
+        sensor.compact()
+    return list(sensors.values())
+
+
+def backfill_rainfall(*args, **kwargs):
+    return asyncio.run(backfill_rainfall_async(*args, **kwargs))
+
+
+def _validate_sewer(text):
+    '''
+    RESULT.CODE가 INFO-000(정상)이거나 INFO-200(해당하는 데이터 없음)일 때만 통과합니다.
+    SEWER_RETRY_CODES의 서버 오류는 ValueError로 fetch가 다시 보내게 하고, 인증키 오류(INFO-100)나
+    요청 오류(ERROR-3xx) 같은 나머지 코드는 다시 보내도 같으므로 RuntimeError를 올립니다.
+    어느 쪽이든 그 구간은 checkpoint에 기록되지 않습니다.
+    '''
+    if not text:
+        raise ValueError("No data received")
+    code = re.search(r'"RESULT"\s*:\s*\{[^}]*"CODE"\s*:\s*"([^"]*)"', text)
+    if code is None:
+        raise ValueError("RESULT.CODE not found")
+    code = code.group(1)
+    if code in SEWER_RETRY_CODES:
+        raise ValueError(f"Server error ({code})")
+    if code not in (SEWER_OK, SEWER_EMPTY):
+        message = re.search(r'"MESSAGE"\s*:\s*("[^"]*")', text)
+        raise RuntimeError(f"{SEWER_SERVICE} {code}: {json.loads(message.group(1)) if message else ''}")
+    if code == SEWER_OK and '"list_total_count"' not in text:
+        raise ValueError("list_total_count not found")
+
+
+def sewer_weeks(start_date, end_date):
+    '''
+    [start_date, end_date] 를 서울 열린데이터 api가 한 번에 줄 수 있는 1주 구간의 (시작, 끝) 문자열로 나눕니다.
+    '''
+    start_date = datetime.strptime(start_date, "%Y%m%d%H")
+    end_date = datetime.strptime(end_date, "%Y%m%d%H")
+    weeks = []
+    while start_date <= end_date:
+        weeks.append((start_date.strftime("%Y%m%d%H"), min(start_date + timedelta(days=6, hours=23), end_date).strftime("%Y%m%d%H")))
+        start_date = start_date + timedelta(days=7)
+    return weeks
+
+
+def _json_field(name, text):
+    # "name": "값" 또는 "name": 값 을 나온 순서대로 찾습니다.
+    return [quoted or bare for quoted, bare in re.findall(rf'"{name}"\s*:\s*(?:"([^"]*)"|([^,}}\s]+))', text)]
+
+
+def parse_sewer_page(text):
+    '''
+    DrainpipeMonitoringInfo 응답 본문에서 row마다 dict를 만들지 않고 필요한 필드만 열 배열로 바로 읽습니다.
+    필드마다 따로 찾으므로 row 수와 세 필드의 개수가 모두 같지 않으면(빠진 필드가 있으면) 값이 밀리지 않도록
+    ValueError를 올립니다. fetch(parse=parse_sewer_page)로 부르면 그 페이지를 다시 받습니다.
+
+    Returns
+    -------
+    (list_total_count, 고유번호 배열, time 배열(datetime64[ns]), 수위 배열(float64)),
+    데이터가 없으면(INFO-200, _validate_sewer를 통과한 본문) total은 0
+    '''
+    total = re.search(r'"list_total_count"\s*:\s*(\d+)', text)
+    if total is None:
+        return 0, np.array([], dtype=object), np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+    row = re.search(r'"row"\s*:\s*\[(.*)\]', text, re.S)
+    rows = row.group(1).count('{') if row is not None else 0
+    fields = {name: _json_field(name, text) for name in ('IDN', 'MEA_YMD', 'MEA_WAL')}
+    if any(len(values) != rows for values in fields.values()):
+        raise ValueError(f"malformed page: row={rows}, " + ', '.join(f'{name}={len(values)}' for name, values in fields.items()))
+    ids = np.array(fields['IDN'], dtype=object)
+    time = pd.to_datetime(fields['MEA_YMD']).to_numpy(dtype='datetime64[ns]')
+    level = pd.to_numeric(pd.Series(fields['MEA_WAL'], dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+    return int(total.group(1)), ids, time, level
+
+
+class SewerBuffer:
+    """
+    하수관로 row를 미리 할당한 열 배열(time, 고유번호 code, 수위)에 모읍니다.
+    capacity를 넘으면 add가 가득 찬 buffer를 DataFrame으로 꺼내 반환하므로 메모리는 capacity 행 분량으로 고정됩니다.
+    """
+    def __init__(self, capacity=SEWER_BUFFER_ROWS):
+        self.capacity = capacity
+        self.time = np.empty(capacity, dtype='datetime64[ns]')
+        self.codes = np.empty(capacity, dtype=np.int32)
+        self.level = np.empty(capacity, dtype=np.float64)
+        # 고유번호 -> code
+        self.ids: dict[str, int] = {}
+        self.n = 0
+
+    def add(self, ids, time, level):
+        '''
+        열 배열을 추가합니다. 가득 찰 때마다 꺼낸 DataFrame들을 리스트로 반환합니다.
+        '''
+        uniques, inverse = np.unique(ids.astype(str), return_inverse=True)
+        codes = np.array([self.ids.setdefault(id, len(self.ids)) for id in uniques], dtype=np.int32)[inverse]
+        taken = []
+        i = 0
+        while i < len(codes):
+            k = min(self.capacity - self.n, len(codes) - i)
+            self.time[self.n:self.n + k] = time[i:i + k]
+            self.codes[self.n:self.n + k] = codes[i:i + k]
+            self.level[self.n:self.n + k] = level[i:i + k]
+            self.n += k
+            i += k
+            if self.n == self.capacity:
+                taken.append(self.take())
+        return taken
+
+    def take(self):
+        '''
+        모인 행을 ['IDN', 'time', 'value'] DataFrame으로 꺼내고 buffer를 비웁니다.
+        '''
+        df = pd.DataFrame({
+            'IDN': pd.Categorical.from_codes(self.codes[:self.n].copy(), categories=list(self.ids)),
+            'time': self.time[:self.n].copy(),
+            'value': self.level[:self.n].copy(),
+        })
+        self.n = 0
+        return df
+
+    def __len__(self):
+        return self.n
+
+
+def _read_checkpoint(file):
+    if file is None or not os.path.exists(file):
+        return set()
+    with open(file) as f:
+        return set(json.load(f)['done'])
+
+
+def _write_checkpoint(file, done):
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump({'done': sorted(done)}, f)
+    os.replace(tmp_file, file)
+
+
+async def download_sewer_async(start_date, end_date, api_key, dir=None, checkpoint=None, base_url=SEOUL_URL,
+                               areas=SEWER_AREAS, concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF, make_meta=None,
+                               compact=True, buffer_rows=None):
+    '''
+    https://data.seoul.go.kr/dataList/OA-2527/S/1/datasetView.do
+
+    하나의 session에서 주 단위, 구 단위로 받습니다. 동시에 보내는 요청은 concurrency개로 제한합니다.
+
+    dir이 있으면 buffer가 가득 찰 때와 (주, 구) 하나를 다 받을 때마다 고유번호별로 {dir}/{id} 센서에 append 하고 checkpoint에 기록합니다.
+    중단된 뒤 다시 실행하면 checkpoint에 있는 (주, 구)는 건너뛰므로, 긴 기간을 받아도 메모리는 한 주 분량만 씁니다.
+    dir이 None이면 받은 행 전체를 ['IDN', 'time', 'value'] DataFrame으로 반환합니다.
+    응답은 parse_sewer_page로 row dict 없이 열 배열로 읽어 SewerBuffer에 모읍니다.
+
+    Args
+    ----
+    start_date, end_date : str
+        시작 / 종료 날짜 (포맷: %Y%m%d%H)
+    api_key : str
+        서울 열린데이터 광장에서 발급받은 API 키
+    dir : str
+        센서를 저장할 디렉토리
+    checkpoint : str
+        checkpoint json 파일, None이면 {dir}/download_checkpoint.json
+    base_url : str
+        api 주소, 테스트 서버로 바꿀 수 있습니다
+    make_meta : callable
+        make_meta(id) -> 새 센서의 meta, None이면 하수관로수위계 기본값
+    compact : bool
+        다 받은 뒤 append한 센서들을 compact 합니다
+    buffer_rows : int
+        SewerBuffer 크기, 이만큼 모이면 센서에 씁니다. None이면 SEWER_BUFFER_ROWS
+    '''
+    if make_meta is None:
+        make_meta = lambda id: {'location': '서울', 'category': '하수관로수위계', 'id': id}
+    if dir is not None and checkpoint is None:
+        checkpoint = os.path.join(dir, SEWER_CHECKPOINT)
+    done = _read_checkpoint(checkpoint)
+    semaphore = asyncio.Semaphore(concurrency)
+    result: list[pd.DataFrame] = []
+    written: dict[str, Sensor] = {}
+
+    buffer = SewerBuffer(buffer_rows or SEWER_BUFFER_ROWS)
+
+    def url_of(i, area, start, end):
+        return f"{base_url}/{api_key}/json/{SEWER_SERVICE}/{i}/{i + SEWER_PAGE_ROWS - 1}/{area}/{start}/{end}"
+
+    def persist(df):
+        for id, value in df.groupby('IDN', observed=True, sort=False):
+            id = str(id)
+            sensor = written.get(id) or Sensor(make_meta(id), path=os.path.join(dir, id))
+            # 중단 후 같은 구간을 다시 받아도 중복이 남지 않도록 keep='last'로 합칩니다.
+            sensor.append(value[['time', 'value']].reset_index(drop=True), keep='last')
+            written[id] = sensor
+
+    # 저장은 한 번에 하나씩 합니다. 구간이 끝날 때 앞서 꺼낸 행들의 저장이 끝난 것을 보장하기 위해서입니다.
+    persist_lock = asyncio.Lock()
+
+    async def flush(dfs):
+        async with persist_lock:
+            for df in dfs:
+                if dir is None:
+                    result.append(df)
+                elif len(df):
+                    await asyncio.to_thread(persist, df)
+
+    async def unit(session, area, start, end):
+        key = f'{start}-{end}/{area}'
+        if key in done:
+            return
+        # 첫 페이지로 전체 행 수를 알아낸 뒤 나머지 페이지는 동시에 받고, 도착하는 대로 buffer에 넣습니다.
+        total_rows, *columns = await fetch(session, url_of(0, area, start, end), semaphore, retries=retries, backoff=backoff,
+                                           validate=_validate_sewer, parse=parse_sewer_page)
+        if total_rows == 0:
+            print(f"No data for sensor_id: {area}")
+        else:
+            print("sensor_id:", area, "total_rows:", total_rows)
+        await flush(buffer.add(*columns))
+        pages = [fetch(session, url_of(i, area, start, end), semaphore, retries=retries, backoff=backoff,
+                       validate=_validate_sewer, parse=parse_sewer_page)
+                 for i in range(SEWER_PAGE_ROWS, total_rows, SEWER_PAGE_ROWS)]
+        for page in asyncio.as_completed(pages):
+            _, *columns = await page
+            await flush(buffer.add(*columns))
+
+        if dir is not None:
+            # 이 구간의 행이 모두 저장된 뒤에 checkpoint에 기록합니다.
+            await flush([buffer.take()])
+            done.add(key)
+            _write_checkpoint(checkpoint, done)
+
+    if dir is not None:
+        os.makedirs(dir, exist_ok=True)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        for start, end in sewer_weeks(start_date, end_date):
+            # 한 주의 구들을 동시에 받고, 다음 주로 넘어갑니다.
+            await asyncio.gather(*[unit(session, area, start, end) for area in areas])
+
+    if dir is not None:
+        if compact:
+            for sensor in written.values():
+                sensor.compact()
+        return list(written.values())
+
+    result.append(buffer.take())
+    return pd.concat(result, ignore_index=True)
+
+
+def download_sewer(*args, **kwargs):
+    return asyncio.run(download_sewer_async(*args, **kwargs))
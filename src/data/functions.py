@@ -1,10 +1,7 @@
 import pandas as pd
 from src import Sensor
-import requests
-from io import StringIO
 import asyncio
-import aiohttp
-from datetime import datetime, timedelta
+from .download import download_rainfall, download_sewer_async
 
 
 def _download_rainfall(authKey, start="202208080000", end="202208160000", stn="401"):
@@ -41,45 +38,8 @@ def _download_rainfall(authKey, start="202208080000", end="202208160000", stn="4
     authKey : str
         기상청 api 인증키
     """
-    df_list = []
-
-    start = pd.to_datetime(start, format='%Y%m%d%H%M')
-    end = pd.to_datetime(end, format='%Y%m%d%H%M')
-
-    # 기상청 api는 12시간씩 끊어서 데이터를 가져올 수 있음.
-    date_range = pd.date_range(start=start, end=end, freq='12h')
-
-    if date_range[-1] != end:
-        date_range = date_range.append(pd.Index([end]))
-
-    for i in range(len(date_range) - 1):
-        tm1 = date_range[i]
-        tm2 = date_range[i + 1] - pd.Timedelta(minutes=1)
-        tm1 = tm1.strftime('%Y%m%d%H%M')
-        tm2 = tm2.strftime('%Y%m%d%H%M')
-
-        url = "https://apihub.kma.go.kr/api/typ01/cgi-bin/url/nph-aws2_min"
-        disp = "1"  # 0 : 변수별로 일정한 길이 유지, 포트란에 적합 (default), 1 : 구분자(,)로 구분, 엑셀에 적합
-        help = "2"  # 0 : 시작과 종료표시 + 변수명 (default), 1 : 0 + 변수에 대한 설명, 2 : 전혀 표시않음 (값만 표시)
-        authKey = authKey
-
-        # URL과 저장 경로 변수를 지정합니다.
-        url = f"{url}?tm1={tm1}&tm2={tm2}&stn={stn}&disp={disp}&help={help}&authKey={authKey}"
-
-        response = requests.get(url)
-        df = pd.read_csv(StringIO(response.content.decode('utf-8')), header=None)
-        df = df.drop(df.columns[18], axis=1)
-        df.columns = ['time', 'STN', 'WD1', 'WS1', 'WDS', 'WSS', 'WD10', 'WS10', 'TA', 'RE', 'RN-15m', 'RN-60m', 'RN-12H', 'RN-DAY', 'HM', 'PA', 'PS', 'TD']
-        df = df.drop('STN', axis=1)
-        # 'time' 열을 datetime 형식으로 변환
-        df['time'] = pd.to_datetime(df['time'], format='%Y%m%d%H%M')
-        df_list.append(df)
-
-    combined_df = pd.concat(df_list, ignore_index=True)
-    columns_to_mask = ['RE', 'RN-15m', 'RN-60m', 'RN-12H', 'RN-DAY']
-    combined_df[columns_to_mask] = combined_df[columns_to_mask].mask(combined_df[columns_to_mask] < 0)
-
-    return combined_df
+    # 12시간 구간들을 하나의 session에서 동시에 요청합니다. (download.py)
+    return download_rainfall(authKey, start=start, end=end, stn=stn)
 
 
 async def _download_sewer(start_date, end_date, api_key):
@@ -93,74 +53,15 @@ async def _download_sewer(start_date, end_date, api_key):
         종료 날짜 (포맷: %Y%m%d%H)
     api_key:
         서울 열린데이터 광장에서 발급받은 API 키
+
+    Returns
+    -------
+    ['IDN', 'time', 'value'] DataFrame, IDN은 category 입니다.
+    예전에는 api의 row를 그대로 반환했지만 지금은 센서에 저장하는 세 필드만 읽으므로 GUBN, SIG_STA 등은 없습니다.
     '''
 
-    async def fetch_data(session, url):
-        i = 1
-        while True:
-            try:
-                async with session.get(url, timeout=10) as response:
-                    data = await response.json()
-                    if data is None:
-                        raise ValueError("No data received")
-                    elif data.get('RESULT', {}).get('CODE') == 'ERROR-500':
-                        raise ValueError("Server error (500)")
-                    return data
-            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
-                print(f"Error at {url}: {e}, retrying {i}")
-                i += 1
-                await asyncio.sleep(2)  # 재시도 전에 잠시 대기
-    
-    base_url = "http://openapi.seoul.go.kr:8088"
-    api_key = api_key
-    data_type = "json"
-    service = "DrainpipeMonitoringInfo"
-    
-    result = []
-    start_date = datetime.strptime(start_date, "%Y%m%d%H")
-    end_date = datetime.strptime(end_date, "%Y%m%d%H")
-
-    while start_date <= end_date:
-        start_date_str = start_date.strftime("%Y%m%d%H")
-        next_week_date = start_date + timedelta(days=6, hours=23)
-        end_date_str = min(next_week_date, end_date).strftime("%Y%m%d%H")
-        
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for sensor_id in range(25):
-                sensor_id = str(sensor_id+1).zfill(2)
-                url = f"{base_url}/{api_key}/{data_type}/{service}/{0}/{1}/{sensor_id}/{start_date_str}/{end_date_str}"
-                tasks.append(fetch_data(session, url))
-            responses = await asyncio.gather(*tasks)
-            
-
-            for sensor_id in range(25):
-                response = responses[sensor_id]
-                if 'DrainpipeMonitoringInfo' not in response:
-                    print(f"No data for sensor_id: {sensor_id}")
-                    continue
-
-                totle_rows = response['DrainpipeMonitoringInfo']['list_total_count']
-                sensor_id = str(sensor_id+1).zfill(2)
-                print("sensor_id:", sensor_id, "total_rows:", totle_rows)
-
-                tasks = []
-                for i in range(0, totle_rows, 1000):
-                    url = f"{base_url}/{api_key}/{data_type}/{service}/{i}/{i+999}/{sensor_id}/{start_date_str}/{end_date_str}"
-                    tasks.append(fetch_data(session, url))
-
-                more_data = await asyncio.gather(*tasks)
-                for item in more_data:
-                    if item:
-                        result.extend(item['DrainpipeMonitoringInfo']['row'])
-        
-        start_date = start_date + timedelta(days=7)
-
-    df = pd.DataFrame(result)
-    column_names = df.columns
-    updated_columns = {col: df[col].to_numpy() for col in column_names}
-    df = pd.DataFrame(updated_columns)
-    return df
+    # 하나의 session, 동시 요청 수 제한, 지수 backoff 재시도 (download.py)
+    return await download_sewer_async(start_date, end_date, api_key)
 
 def download_sewer(*args, **kwargs):
     return asyncio.run(_download_sewer(*args, **kwargs))
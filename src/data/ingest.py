@@ -0,0 +1,308 @@
+"""
+원본 CSV를 센서 디렉토리로 변환하는 ingest 엔진입니다.
+
+    1. 파일마다 앞부분 byte만 읽어 인코딩을 정하고 (실패한 뒤 전체를 다시 읽지 않습니다)
+    2. 프로세스 풀에서 파일을 읽어 센서 id별 DataFrame으로 나누고
+    3. 센서마다 모인 조각을 한 번에 합쳐 (Sensor.concat) 한 번만 저장합니다.
+메모리에 다 올릴 수 없는 큰 파일은 stream_ingest로 chunk 단위로 읽고, 센서별 buffer가 max_bytes를 넘으면
+Sensor.append로 내려씁니다.
+엑셀 파일은 read_excel_cached로 한 번 변환한 열 단위 파일을 재사용합니다.
+pyarrow가 설치되어 있으면 pandas의 pyarrow CSV 엔진을 사용합니다.
+
+ex)
+chunks = ingest(files, id_column='고유번호', rename={'측정일자': 'time', '측정수위': 'value'})
+save_sensors(chunks, lambda id: {'location': '서울', 'category': '하수관로수위계', 'id': id}, 'datasets/sensor/서울/하수관로수위계')
+"""
+import os
+import codecs
+import pickle
+import shutil
+import hashlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+from src.sensor import Sensor, storage
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+ENCODINGS = ['utf-8', 'cp949']
+SAMPLE_BYTES = 1 << 20
+CHUNK_ROWS = 1_000_000
+BUFFER_BYTES = 512 * 1024 ** 2
+EXCEL_CACHE_DIR = os.path.join('datasets', 'cache', 'excel')
+
+
+def detect_encoding(file, encodings=None, sample_bytes=SAMPLE_BYTES):
+    '''
+    파일 앞부분 sample_bytes 만 읽어 디코딩되는 첫 인코딩을 반환합니다. BOM이 있으면 'utf-8-sig' 입니다.
+    '''
+    with open(file, 'rb') as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in encodings or ENCODINGS:
+        try:
+            # 잘린 마지막 글자는 무시하도록 incremental decoder를 씁니다.
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f'unknown encoding: {file}')
+
+
+def _normalize_column(name):
+    # 인코딩이 맞지 않던 BOM이 '?고유번호' 처럼 남은 열 이름을 정리합니다.
+    return str(name).lstrip('\ufeff?').strip()
+
+
+def read_csv(file, encoding=None, **kwargs):
+    '''
+    인코딩을 detect_encoding으로 정해 CSV_ENGINE으로 읽습니다.
+    pyarrow 엔진이 지원하지 않는 옵션이면 기본 엔진으로 읽습니다.
+    '''
+    encoding = encoding or detect_encoding(file)
+    try:
+        df = pd.read_csv(file, encoding=encoding, engine=CSV_ENGINE, **kwargs)
+    except ValueError:
+        if CSV_ENGINE == 'c':
+            raise
+        df = pd.read_csv(file, encoding=encoding, **kwargs)
+    return df.rename(columns=_normalize_column)
+
+
+def _id_str(id):
+    # 1.0 처럼 실수로 읽힌 id는 '1'로 씁니다.
+    if isinstance(id, float) and id.is_integer():
+        id = int(id)
+    return str(id)
+
+
+def read_groups(file, id_column, rename=None, columns=None, encoding=None):
+    '''
+    파일 하나를 읽어 {sensor_id: DataFrame} 로 나눕니다. 프로세스 풀에서 실행됩니다.
+
+    Args
+    ----
+    id_column : str
+        센서 id 열 이름
+    rename : dict
+        열 이름 변경, 시간 열은 'time'이 되어야 합니다
+    columns : list[str]
+        rename 후 남길 열, None이면 id 열을 뺀 전부
+    '''
+    df = read_csv(file, encoding=encoding)
+    df = df.rename(columns=rename or {})
+    if columns is None:
+        columns = [col for col in df.columns if col != id_column]
+    df['time'] = pd.to_datetime(df['time'])
+    return {_id_str(id): group[columns].reset_index(drop=True) for id, group in df.groupby(id_column, sort=False)}
+
+
+def _read_table(file, id_column, rename=None, columns=None, meta_columns=None, encoding=None):
+    # 센서별 value와 meta_columns의 첫 행 값을 함께 반환합니다.
+    meta_columns = meta_columns or []
+    groups = read_groups(file, id_column, rename, None if columns is None else columns + meta_columns, encoding)
+    return {id: (group.drop(columns=meta_columns), group[meta_columns].iloc[0].to_dict()) for id, group in groups.items()}
+
+
+def ingest(files, id_column, rename=None, columns=None, encoding=None, workers=None):
+    '''
+    files를 프로세스 풀에서 read_groups로 읽어 센서 id별 조각 리스트로 모읍니다.
+
+    Returns
+    -------
+    dict[str, list[pd.DataFrame]]
+    '''
+    read = partial(read_groups, id_column=id_column, rename=rename, columns=columns, encoding=encoding)
+    chunks: dict[str, list[pd.DataFrame]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file, groups in zip(files, executor.map(read, files)):
+            print(file)
+            for id, group in groups.items():
+                chunks.setdefault(id, []).append(group)
+    return chunks
+
+
+def save_sensors(chunks, make_meta, dir, keep=None, workers=None):
+    '''
+    센서마다 조각을 한 번에 합쳐 dir/{id} 에 한 번만 저장합니다. 저장은 스레드 풀에서 병렬로 합니다.
+
+    Args
+    ----
+    chunks : dict[str, list[pd.DataFrame]]
+        ingest의 반환값
+    make_meta : callable
+        make_meta(id) -> meta dict
+    keep : str
+        Sensor.concat의 keep
+    '''
+    def save(id):
+        pieces = chunks[id]
+        sensor = Sensor(make_meta(id), pieces[0])
+        if len(pieces) > 1:
+            sensor.concat(pieces[1:], keep=keep)
+        sensor.save(os.path.join(dir, id))
+        return sensor
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(save, chunks))
+
+
+def read_chunks(file, rename=None, chunk_rows=CHUNK_ROWS, encoding=None, **kwargs):
+    '''
+    file을 chunk_rows 행씩 읽어 열 이름을 바꾼 DataFrame으로 yield 합니다.
+    '''
+    encoding = encoding or detect_encoding(file)
+    for chunk in pd.read_csv(file, encoding=encoding, chunksize=chunk_rows, **kwargs):
+        yield chunk.rename(columns=_normalize_column).rename(columns=rename or {})
+
+
+def stream_ingest(chunks, id_column, make_meta, dir, columns=None, max_bytes=BUFFER_BYTES, keep=None):
+    '''
+    DataFrame chunk를 차례로 받아 센서별 buffer에 나눠 담고, buffer 합이 max_bytes를 넘으면
+    큰 buffer부터 센서 디렉토리에 내려씁니다. 파일 크기와 관계없이 메모리는 max_bytes 정도만 사용합니다.
+
+    이번 실행에서 처음 쓰는 센서는 save로 새로 쓰고, 그 뒤로는 append로 세그먼트를 추가합니다.
+    마지막에 쓴 센서들을 compact 합니다.
+
+    Args
+    ----
+    chunks : iterable[pd.DataFrame]
+        read_chunks 등, 'time' 열과 id_column 열이 있어야 합니다
+    make_meta : callable
+        make_meta(id) -> meta dict, None이면 그 센서는 건너뜁니다
+    columns : list[str]
+        저장할 열, None이면 id 열을 뺀 전부
+    keep : str
+        Sensor.append의 keep
+    '''
+    buffers: dict[str, list[pd.DataFrame]] = {}
+    sizes: dict[str, int] = {}
+    sensors: dict[str, Sensor] = {}
+    skipped = set()
+
+    def flush(id):
+        value = pd.concat(buffers.pop(id), ignore_index=True)
+        sizes.pop(id)
+        if id in sensors:
+            sensors[id].append(value, keep=keep)
+        else:
+            sensor = Sensor(make_meta(id), value)
+            sensor.save(os.path.join(dir, id))
+            sensor.value = None
+            sensors[id] = sensor
+
+    for chunk in chunks:
+        chunk['time'] = pd.to_datetime(chunk['time'])
+        names = columns or [col for col in chunk.columns if col != id_column]
+        for id, group in chunk.groupby(id_column, sort=False):
+            id = _id_str(id)
+            if id in skipped:
+                continue
+            if id not in sensors and id not in buffers and make_meta(id) is None:
+                print(f'meta not found: {id}')
+                skipped.add(id)
+                continue
+            group = group[names].reset_index(drop=True)
+            buffers.setdefault(id, []).append(group)
+            sizes[id] = sizes.get(id, 0) + int(group.memory_usage(index=False, deep=True).sum())
+
+        if sum(sizes.values()) > max_bytes:
+            # 큰 buffer부터 절반 아래로 내려갈 때까지 씁니다.
+            for id in sorted(sizes, key=sizes.get, reverse=True):
+                flush(id)
+                if sum(sizes.values()) <= max_bytes // 2:
+                    break
+
+    for id in list(buffers):
+        flush(id)
+    for sensor in sensors.values():
+        sensor.compact()
+    return list(sensors.values())
+
+
+def read_excel_cached(file, cache_dir=None, **kwargs):
+    '''
+    pd.read_excel(file, **kwargs) 결과를 cache_dir에 열 단위(.npy)로 저장해 두고,
+    file의 크기와 수정 시간이 같으면 엑셀을 다시 파싱하지 않고 캐시를 읽습니다.
+
+        {cache_dir}/{파일 이름}-{hash(경로, kwargs)}/
+            info.pkl : 원본 경로, 크기, 수정 시간, 열 이름, schema
+            value/{i}.npy : info['columns'][i] 열
+
+    Args
+    ----
+    cache_dir : str
+        캐시 디렉토리, None이면 EXCEL_CACHE_DIR
+    kwargs :
+        pd.read_excel 인자, sheet_name은 하나만 지정해야 합니다
+    '''
+    file = os.path.abspath(file)
+    stat = os.stat(file)
+    key = hashlib.sha1(repr((file, sorted(kwargs.items()))).encode()).hexdigest()[:16]
+    dir = os.path.join(cache_dir or EXCEL_CACHE_DIR, f'{os.path.basename(file)}-{key}')
+    info_file = os.path.join(dir, 'info.pkl')
+
+    if os.path.exists(info_file):
+        with open(info_file, 'rb') as f:
+            info = pickle.load(f)
+        if (info['size'], info['mtime']) == (stat.st_size, stat.st_mtime_ns):
+            return storage.read_columns(os.path.join(dir, storage.VALUE_DIR), info['columns'],
+                                        mmap_mode=None, schema=info['schema'])
+
+    df = pd.read_excel(file, **kwargs).reset_index(drop=True)
+    # 열 파일 이름은 순서로 정하므로 열 이름은 문자열로 맞춥니다.
+    df.columns = [str(col) for col in df.columns]
+
+    shutil.rmtree(dir, ignore_errors=True)
+    storage.write_columns(os.path.join(dir, storage.VALUE_DIR), df)
+    info = {'file': file, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+            'columns': list(df.columns), 'schema': storage.schema_of(df)}
+    with open(info_file, 'wb') as f:
+        pickle.dump(info, f)
+    return df
+
+
+def ingest_table(files, id_column, dir, make_meta, categories=None, rename=None, columns=None, meta_columns=None,
+                 encoding=None, workers=None):
+    '''
+    여러 센서가 섞인 표 파일들을 파일당 groupby 한 번으로 나눠 {dir}/{category}/{id} 에 저장합니다.
+    파일은 프로세스 풀에서 읽고, 센서는 save_sensors로 병렬로 씁니다.
+
+    Args
+    ----
+    categories : dict
+        파일 이름(확장자 제외) -> category, 없는 파일은 파일 이름을 그대로 씁니다
+    meta_columns : list[str]
+        센서마다 첫 행의 값을 make_meta에 넘길 열, value에서는 빠집니다
+    make_meta : callable
+        make_meta(id, category, row) -> meta dict, row는 meta_columns 값의 dict
+    나머지는 ingest와 같습니다.
+
+    ex)
+    ingest_table(files, 'msrins_nm', 'datasets/sensor/광주', make_meta,
+                 categories={'강우량계': '강수량계'}, rename={'obsr_dt': 'time'}, columns=['time', 'obsr_value'])
+    '''
+    categories = categories or {}
+    read = partial(_read_table, id_column=id_column, rename=rename, columns=columns, meta_columns=meta_columns, encoding=encoding)
+    # category -> id -> 조각들
+    chunks: dict[str, dict[str, list[pd.DataFrame]]] = {}
+    rows: dict[tuple[str, str], dict] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file, groups in zip(files, executor.map(read, files)):
+            print(file)
+            name = os.path.splitext(os.path.basename(file))[0]
+            category = categories.get(name, name)
+            for id, (group, row) in groups.items():
+                chunks.setdefault(category, {}).setdefault(id, []).append(group)
+                rows.setdefault((category, id), row)
+
+    sensors = []
+    for category, category_chunks in chunks.items():
+        sensors += save_sensors(category_chunks, lambda id: make_meta(id, category, rows[(category, id)]),
+                                os.path.join(dir, category), workers=workers)
+    return sensors
@@ -0,0 +1,133 @@
+"""
+받기(fetch) -> 파싱(parse) -> 저장(persist) 처럼 단계가 이어지는 작업을 겹쳐서 실행하는 asyncio pipeline 입니다.
+
+    단계 사이는 크기가 제한된 asyncio.Queue로 연결됩니다. 뒤 단계가 느리면 큐가 차서 앞 단계가 기다리므로(backpressure)
+    메모리가 늘지 않고, 전체 시간은 모든 단계의 합이 아니라 가장 느린 단계에 맞춰집니다.
+    단계마다 처리한 개수와 작업 시간을 기록해 stats()로 어느 단계가 병목인지 볼 수 있습니다.
+
+ex)
+pipeline = Pipeline([
+    Stage('fetch', fetch_window, workers=8),                # async 함수 : 이벤트 루프에서 동시에 실행
+    Stage('parse', parse_rainfall, workers=2, thread=True),  # 일반 함수 : 스레드에서 실행
+    Stage('persist', append_to_sensor, thread=True),
+])
+asyncio.run(pipeline.run(windows))
+print(pipeline.stats())
+"""
+import time
+import asyncio
+
+
+QUEUE_SIZE = 16
+# 큐가 끝났음을 알리는 값
+_DONE = object()
+
+
+class Stage:
+    """
+    pipeline의 한 단계입니다.
+
+    Args
+    ----
+    name : str
+        stats()에 표시할 이름
+    func : callable
+        func(item) -> 다음 단계로 보낼 값, None을 반환하면 보내지 않습니다. async 함수도 됩니다
+    workers : int
+        동시에 func를 실행할 worker 수
+    thread : bool
+        True면 func를 asyncio.to_thread로 실행합니다. 파싱, 디스크 쓰기처럼 이벤트 루프를 막는 일에 씁니다
+    flush : callable
+        입력이 끝난 뒤 한 번 호출합니다. 반환한 리스트의 값들을 다음 단계로 보냅니다 (모아 두었다 쓰는 단계용)
+    """
+    def __init__(self, name, func, workers=1, thread=False, flush=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.thread = thread
+        self.flush = flush
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+
+    async def call(self, item):
+        started = time.perf_counter()
+        if self.thread:
+            result = await asyncio.to_thread(self.func, item)
+        else:
+            result = self.func(item)
+            if asyncio.iscoroutine(result):
+                result = await result
+        self.busy += time.perf_counter() - started
+        self.items += 1
+        return result
+
+    def stats(self, elapsed):
+        return {
+            'items': self.items,
+            'busy': self.busy,
+            # 다음 단계 큐가 가득 차서 기다린 시간, 길면 뒤 단계가 병목입니다.
+            'blocked': self.waiting,
+            'rate': self.items / elapsed if elapsed else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    Stage들을 크기가 queue_size인 큐로 이어 실행합니다. 마지막 단계의 반환값은 버립니다.
+    한 단계에서 예외가 나면 나머지 worker를 취소하고 그 예외를 올립니다.
+    """
+    def __init__(self, stages: list[Stage], queue_size=QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.elapsed = 0.0
+
+    async def run(self, items):
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        started = time.perf_counter()
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def send(stage, i, value):
+            if value is None or i + 1 == len(self.stages):
+                return
+            waiting = time.perf_counter()
+            await queues[i + 1].put(value)
+            stage.waiting += time.perf_counter() - waiting
+
+        async def work(stage, i):
+            while True:
+                item = await queues[i].get()
+                if item is _DONE:
+                    return
+                await send(stage, i, await stage.call(item))
+
+        async def run_stage(stage, i):
+            await asyncio.gather(*[work(stage, i) for _ in range(stage.workers)])
+            if stage.flush is not None:
+                for value in (await asyncio.to_thread(stage.flush) if stage.thread else stage.flush()) or []:
+                    await send(stage, i, value)
+            if i + 1 < len(self.stages):
+                for _ in range(self.stages[i + 1].workers):
+                    await queues[i + 1].put(_DONE)
+
+        tasks = [asyncio.ensure_future(feed())] + [asyncio.ensure_future(run_stage(stage, i)) for i, stage in enumerate(self.stages)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self.elapsed = time.perf_counter() - started
+
+    def stats(self):
+        '''
+        {단계 이름: {'items', 'busy', 'blocked', 'rate'}}, rate는 초당 처리 개수
+        '''
+        return {stage.name: stage.stats(self.elapsed) for stage in self.stages}
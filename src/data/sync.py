@@ -0,0 +1,180 @@
+"""
+저장된 센서의 마지막 시간 이후 구간만 받아 append 하는 증분 동기화입니다.
+
+마지막 시간은 catalog(meta['time_range'])에서 읽으므로 대부분 센서 value를 열지 않습니다.
+catalog에 시간 범위가 없는 센서만 time 열을 읽습니다.
+base_url을 바꿔 로컬 테스트 서버로 보낼 수 있습니다.
+
+ex)
+sync_rainfall('datasets/sensor/서울/강수량계', authKey)
+sync_sewer('datasets/sensor/서울/하수관로수위계', api_key)
+"""
+import os
+import asyncio
+import aiohttp
+import pandas as pd
+from src.sensor import Sensor, Catalog, storage
+from src.data.download import KMA_URL, SEOUL_URL, SEWER_AREAS, CONCURRENCY, RAINFALL_COLUMN, download_rainfall_async, download_sewer_async, \
+    rainfall_per_minute
+
+
+# 세그먼트가 이만큼 쌓이면 compact 합니다. 매번 compact 하면 동기화마다 센서 전체를 다시 씁니다.
+COMPACT_SEGMENTS = 16
+# 구에서 가장 최근 센서보다 이만큼 이상 뒤처진 하수관로 센서는 철거된 것으로 보고 시작 시간 계산에서 뺍니다.
+STALE = pd.Timedelta(days=7)
+
+
+def last_time(sensor):
+    '''
+    meta['time_range']의 마지막 시간, 없으면 value의 time 열에서 읽습니다. 저장된 값이 없으면 None
+    '''
+    time_range = sensor.meta.get('time_range')
+    if time_range is not None:
+        return time_range[1]
+    if sensor.path is None:
+        return None
+    try:
+        time = Sensor.load(sensor.path, columns=[], mmap_mode=None, cache=False).value['time']
+    except (FileNotFoundError, KeyError):
+        return None
+    return time.max() if len(time) else None
+
+
+def _now(freq):
+    return pd.Timestamp.now().floor(freq)
+
+
+def _maybe_compact(sensor):
+    # sensor.meta의 세대는 append 전에 읽은 것이므로 meta.pkl을 다시 읽습니다.
+    log = storage.read_segment_log(storage.data_dir(sensor.path, Sensor.load(sensor.path, only_meta=True).meta))
+    if log is not None and len(log['segments']) >= COMPACT_SEGMENTS:
+        sensor.compact()
+
+
+def sync_rainfall(dir, authKey, end=None, since=None, base_url=KMA_URL, concurrency=CONCURRENCY):
+    '''
+    dir 아래 강수량계(id = 기상청 지점 번호)마다 마지막 시간 이후 ~ end 구간을 기상청 api로 받아 append 합니다.
+    기상청 열과 함께, 서울 강수량계 자료와 같은 의미의 RAINFALL_COLUMN(1분 강수량)을 RN-DAY에서 계산해 붙이므로
+    concat_road_rainfall이나 학습 코드에서 이어 받은 구간도 그대로 읽힙니다.
+
+    Args
+    ----
+    end : str or pd.Timestamp
+        받을 구간의 끝(미포함), None이면 현재 시각(분 단위 내림)
+    since : str or pd.Timestamp
+        저장된 값이 없는 센서의 시작 시간, None이면 그런 센서는 건너뜁니다
+
+    Returns
+    -------
+    {id: 추가한 행 수}
+    '''
+    end = _now('min') if end is None else pd.Timestamp(end)
+    os.makedirs(dir, exist_ok=True)
+    starts = {}
+    for sensor in Catalog.load(dir).update().sensors():
+        last = last_time(sensor)
+        start = last.floor('min') + pd.Timedelta(minutes=1) if last is not None else since
+        if start is None:
+            print(f'{sensor.id}: 저장된 값이 없어 건너뜁니다. since를 주면 그 시간부터 받습니다')
+            continue
+        if pd.Timestamp(start) >= end:
+            continue
+        starts[str(sensor.id)] = (sensor, pd.Timestamp(start))
+
+    async def download():
+        # 모든 지점이 session과 semaphore를 함께 나눠 써서 동시에 보내는 요청이 concurrency개를 넘지 않습니다.
+        semaphore = asyncio.Semaphore(concurrency)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            # 첫 행의 1분 강수량을 구하려면 바로 앞 1분의 RN-DAY가 필요하므로 1분 앞부터 받습니다.
+            tasks = [download_rainfall_async(authKey, (start - pd.Timedelta(minutes=1)).strftime('%Y%m%d%H%M'), end.strftime('%Y%m%d%H%M'), stn=id,
+                                             base_url=base_url, session=session, semaphore=semaphore)
+                     for id, (_, start) in starts.items()]
+            return await asyncio.gather(*tasks)
+
+    added = {}
+    for (id, (sensor, start)), value in zip(starts.items(), asyncio.run(download()) if starts else []):
+        value[RAINFALL_COLUMN] = rainfall_per_minute(value)
+        value = value[(value['time'] >= start) & (value['time'] < end)]
+        if len(value):
+            sensor.append(value, keep='last')
+            _maybe_compact(sensor)
+        added[id] = len(value)
+    return added
+
+
+def _area(id):
+    # 하수관로 고유번호('01-0004')의 앞자리가 구 번호입니다.
+    area = str(id).split('-')[0]
+    return area if area in SEWER_AREAS else None
+
+
+def sewer_starts(sensors, since=None, areas=SEWER_AREAS):
+    '''
+    구마다 다시 받기 시작할 시간(시간 단위 내림)을 구합니다.
+    구 안에서 마지막 시간이 가장 이른 센서부터 받되, 그 구의 가장 최근 센서보다 STALE 이상 뒤처진 센서는 빼므로
+    멈춘 센서 하나 때문에 다른 구까지 예전 구간을 다시 받지 않습니다.
+    저장된 센서가 없는 구는 since부터, since가 None이면 받지 않습니다.
+
+    Returns
+    -------
+    {구 번호: pd.Timestamp}
+    '''
+    lasts: dict[str, list] = {}
+    for sensor in sensors:
+        last, area = last_time(sensor), _area(sensor.id)
+        if last is not None and area is not None:
+            lasts.setdefault(area, []).append((last, sensor.id))
+
+    starts = {}
+    for area in areas:
+        if area not in lasts:
+            if since is not None:
+                starts[area] = pd.Timestamp(since).floor('h')
+            continue
+        latest = max(last for last, _ in lasts[area])
+        stale = [id for last, id in lasts[area] if latest - last >= STALE]
+        if stale:
+            print(f'{area}: 마지막 값이 {STALE} 이상 오래된 센서는 건너뜁니다 {stale}')
+        starts[area] = min(last for last, _ in lasts[area] if latest - last < STALE).floor('h')
+    return starts
+
+
+def sync_sewer(dir, api_key, end=None, since=None, base_url=SEOUL_URL, concurrency=CONCURRENCY):
+    '''
+    dir 아래 하수관로수위계를 구마다 sewer_starts의 시간부터 ~ end 구간을 받아 append 합니다.
+    api가 구 단위로 여러 센서를 한꺼번에 주므로 센서마다 따로 요청하지 않고, 시작 시간이 같은 구는 한 번에 받습니다.
+    이미 있는 시간은 keep='last'로 합쳐져 중복되지 않습니다.
+
+    Args
+    ----
+    end : str or pd.Timestamp
+        받을 구간의 끝(포함, 시간 단위), None이면 현재 시각
+    since : str or pd.Timestamp
+        저장된 센서가 없는 구의 시작 시간
+
+    Returns
+    -------
+    추가된(또는 새로 만든) Sensor 리스트
+    '''
+    end = _now('h') if end is None else pd.Timestamp(end).floor('h')
+    os.makedirs(dir, exist_ok=True)
+    starts = sewer_starts(Catalog.load(dir).update().sensors(), since)
+    if not starts:
+        print(f'{dir}: 저장된 센서가 없어 건너뜁니다. since를 주면 그 시간부터 받습니다')
+    groups: dict[pd.Timestamp, list[str]] = {}
+    for area, start in starts.items():
+        if start <= end:
+            groups.setdefault(start, []).append(area)
+
+    sensors = []
+    for start, areas in sorted(groups.items()):
+        start, end_text = start.strftime('%Y%m%d%H'), end.strftime('%Y%m%d%H')
+        # 이번 동기화 구간 전용 checkpoint, 중단되면 같은 구간으로 다시 실행할 때 이어 받습니다.
+        checkpoint = os.path.join(dir, f'sync_{start}_{end_text}.json')
+        sensors += asyncio.run(download_sewer_async(start, end_text, api_key, dir=dir, checkpoint=checkpoint, base_url=base_url,
+                                                    areas=areas, concurrency=concurrency, compact=False))
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+    for sensor in sensors:
+        _maybe_compact(sensor)
+    return sensors
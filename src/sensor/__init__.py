@@ -1,2 +1,6 @@
 from .sensor import Sensor
+from .catalog import Catalog
+from .spatial import SpatialIndex
+from .bulk import BulkStore
+from .shared import SharedSensorCache
 from .functions import *
\ No newline at end of file
@@ -0,0 +1,212 @@
+import os
+import shutil
+import pickle
+import numpy as np
+import pandas as pd
+from src.sensor import Sensor, Catalog, storage
+
+
+class BulkStore:
+    """
+    카테고리 디렉토리의 모든 센서를 (sensor_id, time) 순서로 정렬된 하나의 테이블로 모은 저장소입니다.
+    여러 센서를 한꺼번에 읽을 때 센서마다 디렉토리를 여는 대신 한 번의 순차 읽기로 처리합니다.
+
+        {category_dir}/_bulk/
+            bulk.pkl : 센서별 meta, 열 이름, 센서별 행 범위, row group 통계
+            value/{i}.npy : bulk.pkl['columns'][i] 열, 'sensor_id'는 sensor_ids의 code
+
+    센서 디렉토리가 없어도 Sensor.load(f'{category_dir}/{id}') 로 읽을 수 있습니다.
+
+    ex)
+    store = BulkStore.build('datasets/sensor/서울/노면수위계2024')
+    df = store.scan(start='2024-07-01', end='2024-07-08', columns=['value'])
+    """
+    DIR = '_bulk'
+    FILE = 'bulk.pkl'
+    ROW_GROUP = 65536
+
+    def __init__(self, dir, state):
+        self.dir = dir
+        self.columns: list[str] = state['columns']
+        self.sensor_ids: list[str] = state['sensor_ids']
+        self.metas: dict[str, dict] = state['metas']
+        # sensor_id -> (시작 행, 끝 행)
+        self.offsets: dict[str, tuple[int, int]] = state['offsets']
+        # [{'start', 'stop', 'time_min', 'time_max', 'code_min', 'code_max'}, ...]
+        self.row_groups: list[dict] = state['row_groups']
+
+    @staticmethod
+    def path_of(category_dir):
+        return os.path.join(category_dir, BulkStore.DIR)
+
+    @staticmethod
+    def exists(category_dir):
+        return os.path.exists(os.path.join(BulkStore.path_of(category_dir), BulkStore.FILE))
+
+    @staticmethod
+    def open(category_dir):
+        dir = BulkStore.path_of(category_dir)
+        with open(os.path.join(dir, BulkStore.FILE), 'rb') as f:
+            return BulkStore(dir, pickle.load(f))
+
+    @staticmethod
+    def build(category_dir, row_group=None):
+        '''
+        category_dir 아래 센서들로 _bulk 를 새로 만듭니다.
+        열 단위로 memory-map 파일에 채워 넣으므로 한 번에 한 센서의 한 열만 메모리에 올립니다.
+        '''
+        row_group = row_group or BulkStore.ROW_GROUP
+        sensors = sorted(Catalog.load(category_dir).update().sensors(), key=lambda s: str(s.id))
+        sensors = [s for s in sensors if os.path.abspath(s.path) != os.path.abspath(BulkStore.path_of(category_dir))]
+        sensor_ids = [str(s.id) for s in sensors]
+        if len(set(sensor_ids)) != len(sensor_ids):
+            raise ValueError(f'duplicate sensor id in {category_dir}')
+
+        # 센서별 열 dtype을 모아 전체 열의 dtype을 정합니다.
+        lengths, dtypes = [], {}
+        for sensor in sensors:
+            value = Sensor.load(sensor.path, cache=False)
+            lengths.append(len(value.value))
+            for col in value.value.columns:
+                if col != 'time':
+                    dtypes.setdefault(col, []).append(value.value[col].dtype)
+        columns = ['sensor_id', 'time'] + list(dtypes)
+        dtypes = {col: BulkStore._common_dtype(types, len(types) < len(sensors)) for col, types in dtypes.items()}
+        dtypes.update({'sensor_id': np.dtype(np.int32), 'time': np.dtype(np.int64)})
+
+        bounds = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        total = int(bounds[-1])
+
+        dir = BulkStore.path_of(category_dir)
+        tmp_dir = dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        value_dir = os.path.join(tmp_dir, storage.VALUE_DIR)
+        os.makedirs(value_dir)
+
+        for i, col in enumerate(columns):
+            dtype = dtypes[col]
+            if dtype == object:
+                array = np.empty(total, dtype=object)
+            else:
+                array = np.lib.format.open_memmap(storage.column_file(value_dir, i), mode='w+', dtype=dtype, shape=(total,))
+            for code, sensor in enumerate(sensors):
+                lo, hi = bounds[code], bounds[code + 1]
+                if col == 'sensor_id':
+                    array[lo:hi] = code
+                    continue
+                df = Sensor.load(sensor.path, columns=[c for c in [col] if c in sensor.meta['columns']], cache=False).value
+                if col not in df.columns:
+                    array[lo:hi] = None if dtype == object else np.nan
+                else:
+                    array[lo:hi] = storage.to_array(df[col], col) if col == 'time' else df[col].to_numpy(dtype=dtype if dtype != object else None)
+            if dtype == object:
+                np.save(storage.column_file(value_dir, i), array, allow_pickle=True)
+            else:
+                array.flush()
+            del array
+
+        # row group 통계 : 조건에 맞지 않는 row group은 읽지 않습니다.
+        time = np.load(storage.column_file(value_dir, 1), mmap_mode='r')
+        codes = np.load(storage.column_file(value_dir, 0), mmap_mode='r')
+        row_groups = []
+        for start in range(0, total, row_group):
+            stop = min(start + row_group, total)
+            row_groups.append({'start': start, 'stop': stop,
+                               'time_min': int(time[start:stop].min()), 'time_max': int(time[start:stop].max()),
+                               'code_min': int(codes[start]), 'code_max': int(codes[stop - 1])})
+        del time, codes
+
+        state = {
+            'columns': columns,
+            'sensor_ids': sensor_ids,
+            'metas': {str(s.id): s.meta for s in sensors},
+            'offsets': {sensor_id: (int(bounds[i]), int(bounds[i + 1])) for i, sensor_id in enumerate(sensor_ids)},
+            'row_groups': row_groups,
+        }
+        with open(os.path.join(tmp_dir, BulkStore.FILE), 'wb') as f:
+            pickle.dump(state, f)
+
+        shutil.rmtree(dir, ignore_errors=True)
+        os.replace(tmp_dir, dir)
+        return BulkStore(dir, state)
+
+    @staticmethod
+    def _common_dtype(types, has_missing):
+        if any(not isinstance(t, np.dtype) or t == object for t in types):
+            return np.dtype(object)
+        dtype = np.result_type(*types)
+        if has_missing and not np.issubdtype(dtype, np.floating):
+            # 열이 없는 센서는 NaN으로 채웁니다.
+            dtype = np.result_type(dtype, np.float32)
+        return dtype
+
+    def _read(self, lo, hi, columns=None, mmap_mode='c'):
+        result = {}
+        for i, name in enumerate(self.columns):
+            if columns is not None and name not in ('sensor_id', 'time') and name not in columns:
+                continue
+            array = storage.load_array(storage.column_file(os.path.join(self.dir, storage.VALUE_DIR), i), mmap_mode)[lo:hi]
+            if name == 'sensor_id':
+                array = pd.Categorical.from_codes(np.asarray(array), categories=self.sensor_ids)
+            result[name] = storage.from_array(array, name)
+        return pd.DataFrame(result, copy=False)
+
+    def sensor(self, id, start=None, end=None, columns=None, mmap_mode='c'):
+        '''
+        한 센서를 Sensor.load와 같은 형태로 반환합니다.
+        '''
+        id = str(id)
+        if id not in self.offsets:
+            raise KeyError(f'sensor not found: {id}')
+        lo, hi = self.offsets[id]
+        if start is not None or end is not None:
+            time = storage.load_array(storage.column_file(os.path.join(self.dir, storage.VALUE_DIR), 1), 'r')[lo:hi]
+            lo, hi = np.add(storage.time_slice(time, start, end), lo)
+
+        meta = self.metas[id]
+        own_columns = [col for col in meta['columns'] if col != 'time']
+        if columns is not None:
+            own_columns = [col for col in own_columns if col in columns]
+        value = self._read(lo, hi, own_columns, mmap_mode).drop(columns=['sensor_id'])
+        return Sensor(meta.copy(), value[['time'] + own_columns])
+
+    def sensors(self):
+        '''
+        bulk에 있는 센서를 meta만 가진 Sensor로 반환합니다.
+        '''
+        return [Sensor(self.metas[id].copy()) for id in self.sensor_ids]
+
+    def scan(self, start=None, end=None, columns=None, ids=None):
+        '''
+        조건에 맞는 모든 센서의 행을 sensor_id 열과 함께 하나의 DataFrame으로 반환합니다.
+        row group의 time / sensor_id 범위로 필요 없는 구간은 읽지 않습니다.
+        '''
+        start = None if start is None else storage.to_epoch(start)
+        end = None if end is None else storage.to_epoch(end)
+        codes = None if ids is None else {self.sensor_ids.index(str(id)) for id in ids if str(id) in self.offsets}
+
+        pieces = []
+        for group in self.row_groups:
+            if start is not None and group['time_max'] < start:
+                continue
+            if end is not None and group['time_min'] >= end:
+                continue
+            if codes is not None and not any(group['code_min'] <= code <= group['code_max'] for code in codes):
+                continue
+            df = self._read(group['start'], group['stop'], columns)
+            mask = np.ones(len(df), dtype=bool)
+            time = df['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+            if start is not None:
+                mask &= time >= start
+            if end is not None:
+                mask &= time < end
+            if codes is not None:
+                mask &= np.isin(df['sensor_id'].cat.codes.to_numpy(), list(codes))
+            pieces.append(df[mask])
+
+        if not pieces:
+            return self._read(0, 0, columns)
+        return pd.concat(pieces, ignore_index=True)
+
+    def __len__(self):
+        return len(self.sensor_ids)
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+class ValueCache:
+    """
+    Sensor.load로 읽은 value를 프로세스 전체에서 공유하는 LRU 캐시입니다.
+    저장된 DataFrame 크기의 합이 max_bytes를 넘으면 가장 오래 쓰지 않은 것부터 버립니다.
+
+    get은 캐시된 DataFrame의 얕은 복사본을 반환하므로 열을 추가하거나 바꿔도 캐시에는 반영되지 않습니다.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sizeof(df: pd.DataFrame):
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def get(self, key, loader):
+        '''
+        key에 해당하는 value를 반환합니다. 없으면 loader()로 읽어서 캐시합니다.
+        '''
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key][0].copy(deep=False)
+
+        value = loader()
+        size = self.sizeof(value)
+        with self._lock:
+            if key not in self._items and size <= self.max_bytes:
+                self._items[key] = (value, size)
+                self.nbytes += size
+                self._evict()
+        return value.copy(deep=False)
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._items:
+            _, (_, size) = self._items.popitem(last=False)
+            self.nbytes -= size
+
+    def invalidate(self, path):
+        '''
+        path 센서의 캐시를 모두 버립니다.
+        '''
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._items if key[0] == path]:
+                _, size = self._items.pop(key)
+                self.nbytes -= size
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+# 환경변수 SENSOR_CACHE_BYTES 로 크기를 정할 수 있습니다. 기본 2GB
+value_cache = ValueCache(int(os.environ.get('SENSOR_CACHE_BYTES', 2 * 1024 ** 3)))
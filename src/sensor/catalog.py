@@ -0,0 +1,119 @@
+import os
+import pickle
+from src.sensor import Sensor
+
+
+class Catalog:
+    """
+    데이터셋 루트 아래 모든 센서의 meta(열 이름, 행 수, 시간 범위 포함)를 하나의 catalog.pkl 로 관리합니다.
+
+    update()는 디렉토리 mtime이 바뀐 디렉토리만 다시 나열하고, meta.pkl mtime이 바뀐 센서만 다시 읽습니다.
+    예전 형식(value.pkl)의 센서는 update()에서 열 단위 형식으로 변환해 행 수와 시간 범위를 기록합니다.
+    update() 없이 load한 Catalog는 센서 디렉토리를 전혀 읽지 않고 검색할 수 있습니다.
+
+    ex)
+    catalog = Catalog.load('datasets/sensor').update()
+    sensors = catalog.sensors(category='강수량계')
+    """
+    FILE = 'catalog.pkl'
+
+    def __init__(self, root):
+        self.root = root
+        # 센서 디렉토리 상대 경로 -> {'mtime': meta.pkl mtime_ns, 'meta': meta}
+        self.entries: dict[str, dict] = {}
+        # 센서가 아닌 디렉토리 상대 경로 -> {'mtime': 디렉토리 mtime_ns, 'children': 하위 디렉토리 이름}
+        self.dirs: dict[str, dict] = {}
+
+    @staticmethod
+    def load(root):
+        '''
+        root/catalog.pkl 을 읽습니다. 파일이 없으면 빈 Catalog를 반환합니다.
+        '''
+        catalog = Catalog(root)
+        file = os.path.join(root, Catalog.FILE)
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                state = pickle.load(f)
+            catalog.entries = state['entries']
+            catalog.dirs = state['dirs']
+        return catalog
+
+    def save(self):
+        file = os.path.join(self.root, Catalog.FILE)
+        with open(file + '.tmp', 'wb') as f:
+            pickle.dump({'entries': self.entries, 'dirs': self.dirs}, f)
+        os.replace(file + '.tmp', file)
+
+    def update(self, save=True):
+        '''
+        바뀐 디렉토리와 센서만 다시 읽어 catalog를 갱신합니다.
+        '''
+        entries, dirs = {}, {}
+        changed = self._visit('', entries, dirs)
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries, self.dirs = entries, dirs
+        if changed and save:
+            self.save()
+        return self
+
+    def _visit(self, rel, entries, dirs):
+        dir = os.path.join(self.root, rel) if rel else self.root
+        changed = False
+
+        if rel in self.entries:
+            # 이미 알고 있는 센서 디렉토리는 meta.pkl 만 확인합니다.
+            try:
+                mtime = os.stat(os.path.join(dir, 'meta.pkl')).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None:
+                if mtime == self.entries[rel]['mtime']:
+                    entries[rel] = self.entries[rel]
+                    return False
+                entries[rel] = self._read_entry(dir, mtime)
+                return True
+
+        mtime = os.stat(dir).st_mtime_ns
+        cached = self.dirs.get(rel)
+        if cached is not None and cached['mtime'] == mtime:
+            children = cached['children']
+        else:
+            meta_file = os.path.join(dir, 'meta.pkl')
+            if os.path.exists(meta_file):
+                entries[rel] = self._read_entry(dir, os.stat(meta_file).st_mtime_ns)
+                return True
+            children = sorted(e.name for e in os.scandir(dir) if e.is_dir())
+            # catalog.pkl 저장만으로도 루트 mtime이 바뀌므로 하위 디렉토리 목록이 바뀐 경우만 변경으로 봅니다.
+            changed = cached is None or cached['children'] != children
+
+        dirs[rel] = {'mtime': mtime, 'children': children}
+        for child in children:
+            changed = self._visit(f'{rel}/{child}' if rel else child, entries, dirs) or changed
+        return changed
+
+    @staticmethod
+    def _read_entry(dir, mtime):
+        with open(os.path.join(dir, 'meta.pkl'), 'rb') as meta_file:
+            meta = pickle.load(meta_file)
+        if meta.get('time_range') is None and os.path.exists(os.path.join(dir, 'value.pkl')):
+            # 예전 형식(value.pkl)의 meta에는 행 수, 시간 범위가 없으므로 처음 볼 때 변환해서 기록합니다.
+            meta = Sensor._migrate(dir)
+            mtime = os.stat(os.path.join(dir, 'meta.pkl')).st_mtime_ns
+        return {'mtime': mtime, 'meta': meta}
+
+    def sensors(self, category=None):
+        '''
+        catalog에 있는 센서를 meta만 가진 Sensor로 반환합니다.
+        '''
+        result = []
+        for rel in sorted(self.entries):
+            meta = self.entries[rel]['meta']
+            if category is not None and meta.get('category') != category:
+                continue
+            sensor = Sensor(meta.copy())
+            sensor.path = os.path.join(self.root, rel)
+            result.append(sensor)
+        return result
+
+    def __len__(self):
+        return len(self.entries)
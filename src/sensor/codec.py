@@ -0,0 +1,106 @@
+"""
+센서 열을 압축하는 codec 입니다. 모든 decode는 numpy 연산(cumsum, bitwise_xor.accumulate, repeat)으로 처리합니다.
+
+    dod : 시간 열, delta-of-delta. 일정한 간격이면 거의 0만 남습니다
+    xor : 실수 열, 이전 값과 bit XOR (Gorilla). 같거나 비슷한 값이 이어지면 0 bit가 많아집니다
+    delta : 정수 열, 이전 값과의 차이
+    rle : 같은 값이 길게 이어지는 열, (값, 길이)
+    raw : 그 외 (문자열 등)
+마지막에 zlib으로 압축합니다.
+"""
+import zlib
+import pickle
+import numpy as np
+
+
+CODEC = 'gorilla'
+EXTENSION = '.z'
+# 값이 바뀌는 횟수가 전체의 이 비율보다 적으면 rle를 사용합니다.
+RLE_RATIO = 0.125
+
+
+def _pack(array):
+    return zlib.compress(np.ascontiguousarray(array).tobytes())
+
+
+def _unpack(data, dtype):
+    return np.frombuffer(zlib.decompress(data), dtype=dtype)
+
+
+def encode(array, name=None):
+    '''
+    numpy 배열을 압축해 dict로 반환합니다. storage.to_array로 변환된 배열을 받습니다.
+    '''
+    array = np.asarray(array)
+    n = len(array)
+    block = {'dtype': array.dtype.str if array.dtype != object else object, 'n': n}
+
+    if array.dtype == object or n == 0:
+        block.update(codec='raw', data=zlib.compress(pickle.dumps(array)))
+        return block
+
+    if array.dtype.kind in 'iubf':
+        # 실수는 NaN != NaN 이므로 bit 단위로 비교합니다.
+        comparable = array.view(f'u{array.dtype.itemsize}') if array.dtype.kind == 'f' else array
+        boundaries = np.flatnonzero(comparable[1:] != comparable[:-1]) + 1
+        if len(boundaries) < n * RLE_RATIO:
+            starts = np.concatenate([[0], boundaries])
+            lengths = np.diff(np.concatenate([starts, [n]]))
+            block.update(codec='rle', values=_pack(array[starts]), lengths=_pack(lengths.astype(np.int64)))
+            return block
+
+    if name == 'time' and array.dtype == np.int64:
+        delta = np.diff(array)
+        block.update(codec='dod', first=int(array[0]), first_delta=int(delta[0]) if n > 1 else 0,
+                     data=_pack(np.diff(delta)))
+        return block
+
+    if array.dtype.kind == 'f':
+        bits = array.view(f'u{array.dtype.itemsize}')
+        block.update(codec='xor', data=_pack(bits ^ np.concatenate([bits[:1] * 0, bits[:-1]])))
+        return block
+
+    if array.dtype.kind in 'iu':
+        block.update(codec='delta', first=int(array[0]), data=_pack(np.diff(array)))
+        return block
+
+    block.update(codec='raw', data=zlib.compress(pickle.dumps(array)))
+    return block
+
+
+def decode(block):
+    '''
+    encode로 압축한 dict를 numpy 배열로 되돌립니다.
+    '''
+    codec, n = block['codec'], block['n']
+    if codec == 'raw':
+        return pickle.loads(zlib.decompress(block['data']))
+
+    dtype = np.dtype(block['dtype'])
+    if codec == 'rle':
+        return np.repeat(_unpack(block['values'], dtype), _unpack(block['lengths'], np.int64))
+
+    if codec == 'dod':
+        if n == 1:
+            return np.array([block['first']], dtype=dtype)
+        delta = block['first_delta'] + np.concatenate([[0], np.cumsum(_unpack(block['data'], np.int64))])
+        return block['first'] + np.concatenate([[0], np.cumsum(delta)]).astype(dtype)
+
+    if codec == 'xor':
+        bits = np.bitwise_xor.accumulate(_unpack(block['data'], f'u{dtype.itemsize}'))
+        return bits.view(dtype)
+
+    if codec == 'delta':
+        return np.concatenate([[block['first']], block['first'] + np.cumsum(_unpack(block['data'], dtype))]).astype(dtype)
+
+    raise ValueError(f'unknown codec: {codec}')
+
+
+def save(file, array, name=None):
+    with open(file, 'wb') as f:
+        pickle.dump(encode(array, name), f)
+
+
+def load(file):
+    with open(file, 'rb') as f:
+        return decode(pickle.load(f))
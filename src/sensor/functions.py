@@ -1,18 +1,107 @@
 import os
-from src.sensor import Sensor
+from src.sensor import Sensor, Catalog
+
+
+def findSensorDirs(dir):
+    '''
+    meta.pkl 이 있는 디렉토리를 센서 디렉토리로 보고 모두 찾습니다.
+    센서 디렉토리 아래(value/ 등)는 더 탐색하지 않습니다.
+    '''
+    sensor_dirs = []
+    for dirpath, dirnames, filenames in os.walk(dir):
+        if 'meta.pkl' in filenames:
+            sensor_dirs.append(dirpath)
+            dirnames.clear()
+        else:
+            dirnames.sort()
+    return sensor_dirs
 
 
 def getAllSensors(dir, only_meta=True):
-    leaf_dirs = [dirpath for dirpath, dirnames, _ in os.walk(dir) if not dirnames]
-    sensors = [Sensor.load(sensor, only_meta=only_meta) for sensor in leaf_dirs]
+    '''
+    only_meta가 True면 dir/catalog.pkl 을 갱신해서 meta를 가져오므로 바뀌지 않은 센서의 meta.pkl 은 읽지 않습니다.
+    '''
+    if only_meta:
+        return Catalog.load(dir).update().sensors()
+    sensors = [Sensor.load(sensor, only_meta=only_meta) for sensor in findSensorDirs(dir)]
     return sensors
 
 
+class SensorIndex:
+    """
+    searchSensors를 반복 호출할 때 쓰는 색인입니다.
+    id, category는 hash로, location은 2-gram 색인으로 찾으므로 센서 수가 아니라 결과 수에 비례해서 검색합니다.
+    색인을 만든 뒤 센서의 meta가 바뀌면 다시 만들어야 합니다.
+
+    ex)
+    index = SensorIndex(getAllSensors('datasets/sensor/서울/강수량계'))
+    sensor = index.search(id='401')
+    """
+    N = 2
+
+    def __init__(self, sensors):
+        self.sensors = list(sensors)
+        self.by_id: dict[str, list[int]] = {}
+        self.by_category: dict[str, list[int]] = {}
+        self.by_gram: dict[str, set[int]] = {}
+
+        for i, sensor in enumerate(self.sensors):
+            self.by_id.setdefault(str(sensor.id), []).append(i)
+            self.by_category.setdefault(sensor.category, []).append(i)
+            location = sensor.meta.get('location') or ''
+            for gram in self._grams(location):
+                self.by_gram.setdefault(gram, set()).add(i)
+
+    @staticmethod
+    def _grams(text):
+        return {text[i:i + SensorIndex.N] for i in range(len(text) - SensorIndex.N + 1)}
+
+    def _location_candidates(self, location):
+        if len(location) < SensorIndex.N:
+            return set(range(len(self.sensors)))
+        # 가장 작은 posting부터 교집합을 구합니다.
+        postings = sorted((self.by_gram.get(gram, set()) for gram in self._grams(location)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+        return candidates
+
+    def search(self, location:str=None, category:str=None, id:str=None):
+        """
+        searchSensors와 같은 결과를 반환합니다. 결과가 없으면 None, 하나면 Sensor, 여러개면 list 입니다.
+        """
+        candidates = None
+        if id:
+            candidates = set(self.by_id.get(str(id), []))
+        if category:
+            matched = set(self.by_category.get(category, []))
+            candidates = matched if candidates is None else candidates & matched
+        if location:
+            matched = self._location_candidates(location) if candidates is None or len(candidates) > 8 else candidates
+            candidates = matched if candidates is None else candidates & matched
+            candidates = {i for i in candidates if location in (self.sensors[i].meta.get('location') or '')}
+        if candidates is None:
+            candidates = range(len(self.sensors))
+
+        matched_sensors = [self.sensors[i] for i in sorted(candidates)]
+        if len(matched_sensors) == 0:
+            return None
+        if len(matched_sensors) == 1:
+            matched_sensors = matched_sensors[0]
+        return matched_sensors
+
+    def __len__(self):
+        return len(self.sensors)
+
+
 def searchSensors(sensors, location:str=None, category:str=None, id:str=None):
     """
     주어진 조건에 맞는 센서를 검색합니다.
+    sensors가 SensorIndex면 색인으로 검색합니다.
     """
-    
+    if isinstance(sensors, SensorIndex):
+        return sensors.search(location=location, category=category, id=id)
+
     matched_sensors = []
 
     for sensor in sensors:
@@ -0,0 +1,101 @@
+"""
+센서 value를 시간 간격별로 미리 집계해 둔 rollup 입니다. 아래 함수의 path는 센서의 세대 디렉토리(storage.data_dir) 입니다.
+
+    {세대}/rollup/{freq}/{i}.npy : save 때 집계한 값의 i번째 열
+    {세대}/rollup/{freq}/segments/ : append로 다시 계산한 구간, 읽을 때 같은 시간은 나중 값으로 덮어씁니다
+열 이름은 'time' 과 '{원래 열}|{집계}' 입니다. 값이 하나도 없는 구간은 저장하지 않습니다.
+append는 바뀐 구간만 세그먼트로 쓰므로 rollup 전체를 다시 쓰지 않고, Sensor.compact 때 새 세대에 하나로 합쳐 씁니다.
+"""
+import os
+import pandas as pd
+from src.sensor import storage
+
+
+ROLLUP_DIR = 'rollup'
+ROLLUPS = ['1min', '10min', '1h']
+AGGS = ['max', 'mean', 'min', 'last', 'count']
+
+
+def rollup_dir(path, freq):
+    return os.path.join(path, ROLLUP_DIR, freq)
+
+
+def aggregate(value: pd.DataFrame, freq):
+    '''
+    숫자 열을 freq 구간별로 AGGS 집계합니다.
+    '''
+    columns = [col for col in value.columns
+               if col != 'time' and pd.api.types.is_numeric_dtype(value[col].dtype) and not pd.api.types.is_bool_dtype(value[col].dtype)]
+    if not columns:
+        # 집계할 열이 없으면 resample().agg가 실패하므로 time 열만 있는 빈 rollup을 반환합니다.
+        return pd.DataFrame({'time': pd.Series(dtype='datetime64[ns]')})
+    df = value[['time'] + columns].set_index('time').resample(freq).agg(AGGS)
+    df.columns = [f'{col}|{agg}' for col, agg in df.columns]
+    counts = df[[f'{col}|count' for col in columns]]
+    return df[(counts > 0).any(axis=1)].reset_index()
+
+
+def write(path, freq, df, codec=None):
+    storage.write_columns(rollup_dir(path, freq), df, codec=codec)
+    return list(df.columns)
+
+
+def update(path, freq, names, raw):
+    '''
+    raw가 걸친 freq 구간의 rollup을 다시 계산해 세그먼트로 추가하고, 열 이름 목록(meta['rollups'][freq])을 반환합니다.
+    raw는 bounds(추가된 시간, freq) 구간의 원본 전체여야 합니다.
+    구간 안의 예전 값은 읽을 때 새 값으로 덮어써지므로 기존 rollup은 읽지도 다시 쓰지도 않습니다.
+    새로 생긴 열은 예전 구간에서 NaN 입니다.
+    '''
+    dir = rollup_dir(path, freq)
+    new = aggregate(raw, freq)
+    log = storage.read_segment_log(dir) or {'base': list(names), 'segments': []}
+    name = f"{max([int(s['name']) for s in log['segments']], default=0) + 1:06d}"
+    storage.write_columns(os.path.join(dir, storage.SEGMENT_DIR, name), new)
+    log['segments'].append({'name': name, 'columns': list(new.columns), 'keep': 'last'})
+    storage.write_segment_log(dir, log)
+    return list(names) + [col for col in new.columns if col not in names]
+
+
+def bounds(times: pd.Series, freq):
+    '''
+    times를 포함하는 freq 경계의 [start, end) 를 반환합니다.
+    '''
+    return times.min().floor(freq), times.max().floor(freq) + pd.tseries.frequencies.to_offset(freq)
+
+
+def read(path, freq, names, columns=None, agg=None, start=None, end=None, mmap_mode='c'):
+    '''
+    rollup을 읽습니다.
+
+    Args
+    ----
+    names : list[str]
+        meta['rollups'][freq]
+    columns : list[str]
+        원래 열 이름, None이면 전부
+    agg : str
+        AGGS 중 하나를 주면 그 집계만 원래 열 이름으로 반환합니다. None이면 '{열}|{집계}' 열을 전부 반환합니다
+    '''
+    from src.sensor.sensor import _merge
+
+    wanted = None
+    if columns is not None or agg is not None:
+        wanted = [name for name in names if name != 'time'
+                  and (columns is None or name.split('|')[0] in columns)
+                  and (agg is None or name.split('|')[1] == agg)]
+    project = lambda stored: None if wanted is None else [name for name in wanted if name in stored]
+
+    dir = rollup_dir(path, freq)
+    log = storage.read_segment_log(dir)
+    base = names if log is None else log['base']
+    df = storage.read_columns(dir, base, columns=project(base), start=start, end=end, mmap_mode=mmap_mode)
+    if log is not None:
+        segments = [storage.read_columns(os.path.join(dir, storage.SEGMENT_DIR, segment['name']), segment['columns'],
+                                         columns=project(segment['columns']), start=start, end=end, mmap_mode=mmap_mode)
+                    for segment in log['segments']]
+        df = _merge(df, segments, 'last')
+        df = df[['time'] + [name for name in names if name in df.columns and name != 'time']]
+    if agg is not None:
+        df = df.rename(columns={name: name.split('|')[0] for name in df.columns if name != 'time'})
+    return df
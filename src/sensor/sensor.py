@@ -1,9 +1,140 @@
 import os
+import shutil
+import itertools
+import threading
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import pickle
+from src.sensor import storage, rollup, stats as sensor_stats
+from src.sensor.cache import value_cache
+
+
+# 같은 센서 디렉토리에 대한 save / append / compact / migrate 를 직렬화합니다. load는 meta.pkl이 가리키는 세대를 읽으므로 기다리지 않습니다.
+# append, compact 안에서 load를 부르므로 같은 스레드에서 다시 잡을 수 있는 RLock 입니다.
+_path_locks: dict[str, threading.RLock] = {}
+_path_locks_guard = threading.Lock()
+# 스레드마다 지금 잡고 있는 센서 디렉토리 lock 파일의 중첩 횟수
+_held = threading.local()
+
+
+def _path_lock(path):
+    with _path_locks_guard:
+        return _path_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+@contextmanager
+def _locked(path):
+    '''
+    프로세스 안에서는 _path_lock으로, 프로세스 사이에서는 storage.locked(lock 파일)로 센서 디렉토리의 쓰기를 직렬화합니다.
+    lock 파일은 같은 스레드에서 다시 잡으면 막히므로 스레드마다 처음 한 번만 잡습니다.
+    '''
+    key = os.path.abspath(path)
+    with _path_lock(path):
+        held = _held.__dict__.setdefault('paths', {})
+        if held.get(key):
+            held[key] += 1
+            try:
+                yield
+            finally:
+                held[key] -= 1
+            return
+        os.makedirs(path, exist_ok=True)
+        with storage.locked(path):
+            held[key] = 1
+            try:
+                yield
+            finally:
+                held[key] = 0
+
+
+def _times(df):
+    return pd.to_datetime(df['time']).to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def _is_sorted(times):
+    return len(times) < 2 or bool((times[1:] >= times[:-1]).all())
+
+
+def _dedup_sorted(value, times, keep):
+    # 정렬된 상태에서 같은 시간은 붙어 있으므로 각 구간의 처음/마지막만 남깁니다.
+    if keep is None or len(times) < 2:
+        return value
+    changed = times[1:] != times[:-1]
+    if keep == 'first':
+        mask = np.concatenate([[True], changed])
+    else:
+        mask = np.concatenate([changed, [True]])
+    return value[mask].reset_index(drop=True)
+
+
+def _merge(left, right, keep=None):
+    '''
+    DataFrame들을 합치고 time 기준으로 정렬합니다. keep은 Sensor.concat과 같습니다.
+
+    이미 정렬된 입력은 정렬하지 않고 선형으로 병합합니다.
+        두 개 : left의 각 위치에 right가 들어갈 위치를 이진 탐색으로 구해 한 번에 배치
+        여러 개 : 정렬된 구간(run)들을 stable 정렬(timsort)로 병합
+    같은 시간은 left(앞쪽) 행이 먼저 오므로 keep='first'/'last'는 drop_duplicates와 같은 행을 남깁니다.
+    '''
+    pieces = [left] + (list(right) if isinstance(right, (list, tuple)) else [right])
+    pieces = [df for df in pieces if df is not None]
+    times = [_times(df) for df in pieces]
+
+    if keep not in (None, 'first', 'last') or not _is_sorted(times[0]):
+        value = pd.concat(pieces)
+        if keep is not None:
+            value = value.drop_duplicates(subset=['time'], keep=keep)
+        return value.sort_values(by='time', kind='stable').reset_index(drop=True)
+
+    # 기존 value 외의 입력은 정렬되어 있지 않으면 먼저 정렬합니다.
+    for i in range(1, len(pieces)):
+        if not _is_sorted(times[i]):
+            order = np.argsort(times[i], kind='stable')
+            pieces[i], times[i] = pieces[i].iloc[order], times[i][order]
+
+    value = pd.concat(pieces, ignore_index=True)
+    merged = np.concatenate(times)
+    if _is_sorted(merged):
+        # 시간이 겹치지 않고 이어지는 경우(대부분의 append)
+        order = None
+    elif len(pieces) == 2:
+        n, m = len(times[0]), len(times[1])
+        right_positions = np.searchsorted(times[0], times[1], side='right') + np.arange(m)
+        is_right = np.zeros(n + m, dtype=bool)
+        is_right[right_positions] = True
+        order = np.empty(n + m, dtype=np.int64)
+        order[right_positions] = np.arange(n, n + m)
+        order[~is_right] = np.arange(n)
+    else:
+        order = np.argsort(merged, kind='stable')
+
+    if order is not None:
+        value = value.take(order).reset_index(drop=True)
+        merged = merged[order]
+    return _dedup_sorted(value, merged, keep)
+
 
 class Sensor:
     """
+    센서 디렉토리 구조
+        {Sensor name}/
+            meta.pkl : meta data, meta['generation']이 지금 읽을 세대 디렉토리 입니다
+            .lock : save, append, compact를 프로세스 사이에서 직렬화하는 lock 파일
+            g{n}/ : save, compact 마다 새로 쓰는 세대 디렉토리
+                value/{i}.npy : meta['columns'][i] 열, 'time'은 int64 epoch(ns)
+                                save(codec='gorilla')면 압축된 {i}.z
+                rollup/{freq}/ : save(rollups=...)로 미리 집계한 값
+                segments/ : append로 추가된 세그먼트, load 시 합쳐지고 compact로 value에 합쳐집니다
+    새 세대를 모두 쓴 뒤 meta.pkl을 한 번에 교체하는 것이 commit 이므로, 쓰는 도중 실패해도 이전 세대를 그대로 읽습니다.
+    예전 형식인 value.pkl 과 세대 디렉토리 없이 value/ 가 바로 있는 센서는 load 시 자동으로 변환되거나 그대로 읽힙니다.
+
+    value 없이 path만 있는 Sensor(load(only_meta=True), catalog)는 value에 처음 접근할 때
+    cache.value_cache를 통해 읽습니다. 이 경우 접근할 때마다 캐시의 얕은 복사본을 반환하므로
+    수정하려면 먼저 변수에 담아서 쓰세요.
+
     ex)
     meta = {
         'location':'서울특별시 서초구 서초동 1416번지 서초 IC',
@@ -18,9 +149,32 @@ class Sensor:
             value['time'] = pd.to_datetime(value['time'])
 
         self.value = value
-        self.path = None
+        self.path = path
+
+    @property
+    def value(self):
+        if self._value is None and self.path is not None and os.path.exists(os.path.join(self.path, 'meta.pkl')):
+            # 메모리에 붙잡아 두지 않고 캐시에서 가져옵니다.
+            return Sensor.load(self.path).value
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
 
-    def save(self, path=None):
+    def save(self, path=None, codec=None, rollups=None):
+        '''
+        Args
+        ----
+        path : str
+            센서 디렉토리, None이면 self.path
+        codec : str
+            'gorilla'면 value를 codec.py로 압축해서 저장합니다. None이면 meta['codec']을 따릅니다
+        rollups : bool or list[str]
+            True면 rollup.ROLLUPS, 리스트면 그 간격들로 max, mean, min, last, count를 미리 집계해 저장합니다.
+            append 시 바뀐 구간만 다시 계산되고, load(resolution=...)로 읽습니다.
+            None이면 meta['rollups']을 따르고, False면 지웁니다
+        '''
         if path is None:
             if self.path is None:
                 raise ValueError('path is None')
@@ -30,51 +184,390 @@ class Sensor:
             raise ValueError('value is None')
 
         os.makedirs(path, exist_ok=True)
-        
-        with open(os.path.join(path, 'meta.pkl'), 'wb') as meta_file:
-            meta = self.meta.copy()
-            meta['columns'] = list(self.value.columns)
-            pickle.dump(meta, meta_file)
 
-
-        self.value.sort_values(by='time', inplace=True)
+        self.value = self.value.sort_values(by='time')
         self.compress()
 
-        # value를 저장합니다.
-        with open(os.path.join(path, 'value.pkl'), 'wb') as value_file:
-            pickle.dump(self.value, value_file)
+        meta = Sensor._summarize(self.meta.copy(), self.value)
+        meta['codec'] = codec if codec is not None else self.meta.get('codec')
+
+        if rollups is None:
+            rollups = list(self.meta.get('rollups') or [])
+        elif rollups is True:
+            rollups = rollup.ROLLUPS
+        frames = {freq: rollup.aggregate(self.value, freq) for freq in rollups or []}
+        # 저장한 value에 세그먼트가 이미 포함되어 있다고 보고, 새 세대에는 세그먼트 없이 씁니다.
+        with _locked(path):
+            Sensor._commit(path, meta, self.value, frames)
 
-                    
         self.path = path
 
+    def append(self, other, keep=None, path=None):
+        '''
+        value 전체를 다시 쓰지 않고, 추가할 데이터만 정렬된 세그먼트로 저장합니다.
+        load 시 세그먼트가 concat(keep)과 같은 규칙으로 합쳐지고, compact()로 value에 합칠 수 있습니다.
+        저장된 센서가 없으면 save()와 같습니다.
+
+        Args
+        ----
+        other : pd.DataFrame or Sensor
+            추가할 데이터
+        keep : str
+            concat의 keep과 같습니다
+        path : str
+            센서 디렉토리, None이면 self.path
+        '''
+        if isinstance(other, Sensor):
+            other = other.value
+        path = self.path if path is None else path
+        if path is None:
+            raise ValueError('path is None')
+
+        other = other.copy()
+        other['time'] = pd.to_datetime(other['time'])
+        other = other.sort_values(by='time', kind='stable')
+        other = pd.DataFrame({col: storage.compact_array(other[col], col) for col in other.columns})
+        if os.path.exists(os.path.join(path, 'value.pkl')):
+            # 예전 형식이면 세그먼트를 붙이기 전에 변환합니다.
+            Sensor._migrate(path)
+
+        with _locked(path):
+            if not os.path.exists(os.path.join(path, 'meta.pkl')):
+                # 같은 센서에 동시에 처음 append 해도 한 번만 save 되도록 lock 안에서 확인합니다.
+                self.value = other
+                self.save(path)
+                return
+
+            meta = Sensor._load_meta(path)
+            dir = storage.data_dir(path, meta)
+            # 중복으로 지워질 행이 없을 때만 통계를 합칩니다. 아니면 compact 때 다시 계산합니다.
+            if meta.get('stats') is not None and Sensor._drops_rows(path, meta, other, keep):
+                meta['stats'] = None
+            log = storage.read_segment_log(dir) or {'base': list(meta['columns']), 'segments': []}
+
+            name = f"{max([int(s['name']) for s in log['segments']], default=0) + 1:06d}"
+            storage.write_columns(os.path.join(dir, storage.SEGMENT_DIR, name), other)
+            log['segments'].append({'name': name, 'columns': list(other.columns), 'schema': storage.schema_of(other), 'keep': keep})
+            storage.write_segment_log(dir, log)
+
+            meta['columns'] = meta['columns'] + [col for col in other.columns if col not in meta['columns']]
+            meta['stats'] = sensor_stats.merge(meta.get('stats'), sensor_stats.describe(other), meta.get('length', 0), len(other))
+            # keep으로 지워질 중복은 compact 전까지 length에 포함됩니다.
+            meta['length'] = meta.get('length', 0) + len(other)
+            if len(other):
+                time_range = (other['time'].iloc[0], other['time'].iloc[-1])
+                if meta.get('time_range') is not None:
+                    time_range = (min(time_range[0], meta['time_range'][0]), max(time_range[1], meta['time_range'][1]))
+                meta['time_range'] = time_range
+
+            if meta.get('rollups') and len(other):
+                # 추가된 행이 걸친 구간의 rollup만 다시 계산합니다.
+                for freq in meta['rollups']:
+                    start, end = rollup.bounds(other['time'], freq)
+                    raw = Sensor.load(path, start=start, end=end, mmap_mode=None, cache=False).value
+                    meta['rollups'][freq] = rollup.update(dir, freq, meta['rollups'][freq], raw)
+
+            Sensor._dump_meta(path, meta)
+            value_cache.invalidate(path)
+            self.meta.update({key: meta[key] for key in ('columns', 'length', 'time_range', 'stats', 'rollups') if key in meta})
+
+        # 메모리의 value는 더 이상 최신이 아니므로 버립니다. 다음 접근 때 다시 읽습니다.
+        self.value = None
+        self.path = path
+
+    @staticmethod
+    def _drops_rows(path, meta, other, keep):
+        '''
+        other를 keep으로 합칠 때 지워지는 행이 있는지 확인합니다. 겹치는 시간 구간의 time 열만 읽습니다.
+        '''
+        if keep is None or not len(other):
+            return False
+        if other['time'].duplicated().any():
+            return True
+        if meta.get('time_range') is None or other['time'].iloc[0] > meta['time_range'][1]:
+            return False
+        existing = Sensor.load(path, start=other['time'].iloc[0], end=other['time'].iloc[-1] + pd.Timedelta(1, 'ns'),
+                               columns=[], mmap_mode=None, cache=False).value['time']
+        return bool(other['time'].isin(existing).any())
+
+    def compact(self, background=False):
+        '''
+        append로 쌓인 세그먼트를 value에 합쳐 다시 저장합니다.
+        background가 True면 스레드에서 실행하고 threading.Thread를 반환합니다.
+        compact가 끝날 때까지 (다른 프로세스를 포함해) 같은 센서의 append는 기다리고, load는 commit 전까지 이전 세대를 읽습니다.
+        '''
+        if self.path is None:
+            raise ValueError('path is None')
+        if background:
+            thread = threading.Thread(target=Sensor._compact, args=(self.path,), daemon=False)
+            thread.start()
+            return thread
+        Sensor._compact(self.path)
+
+    @staticmethod
+    def _compact(path):
+        with _locked(path):
+            dir = storage.data_dir(path, Sensor._load_meta(path))
+            if not storage.has_segments(dir):
+                return
+            merged = Sensor.load(path, mmap_mode=None, cache=False)
+            merged.compress()
+
+            meta = Sensor._summarize(merged.meta, merged.value)
+            frames = {freq: rollup.read(dir, freq, names, mmap_mode=None) for freq, names in (meta.get('rollups') or {}).items()}
+            # 합친 value, schema, rollup을 세그먼트 없는 새 세대로 한 번에 commit 하므로
+            # 세그먼트가 두 번 합쳐지거나 schema와 category code가 어긋난 상태는 보이지 않습니다.
+            Sensor._commit(path, meta, merged.value, frames)
+
     def compress(self):
         column_names = self.value.columns
-        # 각 열을 to_numpy()를 사용하여 numpy 배열로 변환하고, 이를 새로운 DataFrame으로 재구성합니다.
-        updated_columns = {col: self.value[col].to_numpy() for col in column_names}
+        # 각 열을 값에 맞는 작은 dtype의 배열로 변환하고(storage.compact_array), 이를 새로운 DataFrame으로 재구성합니다.
+        # 고른 dtype은 save 시 meta['schema']에 기록됩니다.
+        updated_columns = {col: storage.compact_array(self.value[col], col) for col in column_names}
         self.value = pd.DataFrame(updated_columns)
 
     @staticmethod
-    def load(path, only_meta=False, groupby=False):
-        with open(os.path.join(path, 'meta.pkl'), 'rb') as meta_file:
-            meta = pickle.load(meta_file)
-        
+    def load(path, only_meta=False, groupby=False, start=None, end=None, columns=None, mmap_mode='c', cache=True,
+             resolution=None, agg=None):
+        '''
+        Args
+        ----
+        path : str
+            센서 디렉토리
+        only_meta : bool
+            True면 meta만 읽습니다
+        groupby : bool
+            디렉토리 안의 여러 .pkl 파일을 합쳐서 읽습니다
+        start, end :
+            start <= time < end 구간만 읽습니다. 저장된 time 열이 정렬되어 있으므로 이진 탐색으로 구간을 찾고
+            그 구간만 디스크에서 읽습니다
+        columns : list[str]
+            읽을 열 이름, 'time' 열은 항상 포함됩니다
+        mmap_mode : str
+            value 열 파일을 memory-map 으로 엽니다. 'c'는 수정 내용이 디스크에 반영되지 않는 copy-on-write,
+            None이면 전부 메모리로 읽습니다
+        cache : bool
+            같은 인자로 읽은 value를 cache.value_cache에서 가져옵니다.
+            meta.pkl 이 바뀌면(save, append, compact) 다시 읽습니다
+        resolution : str
+            save(rollups=...)로 저장한 간격('1min', '10min', '1h')을 주면 원본 대신 rollup을 읽습니다
+        agg : str
+            resolution과 함께 'max', 'mean', 'min', 'last', 'count' 중 하나를 주면 그 집계만 원래 열 이름으로 읽습니다.
+            None이면 '{열}|{집계}' 열을 전부 읽습니다
+        '''
+        if not os.path.exists(os.path.join(path, 'meta.pkl')):
+            # 센서 디렉토리가 없으면 상위 카테고리 디렉토리의 bulk store에서 찾습니다.
+            from src.sensor.bulk import BulkStore
+            category_dir, id = os.path.split(os.path.normpath(path))
+            if BulkStore.exists(category_dir):
+                result = BulkStore.open(category_dir).sensor(id, start=start, end=end, columns=columns, mmap_mode=mmap_mode)
+                if only_meta:
+                    result.value = None
+                result.path = path
+                return result
+
+        meta = Sensor._load_meta(path)
+        while True:
+            try:
+                return Sensor._load(path, meta, only_meta, groupby, start, end, columns, mmap_mode, cache, resolution, agg)
+            except FileNotFoundError:
+                # meta.pkl을 읽은 뒤 save / compact가 새 세대를 commit하고 이전 세대를 지웠으면 새 meta로 다시 읽습니다.
+                # 세대가 그대로면 정말 없는 파일입니다.
+                generation, meta = meta.get('generation'), Sensor._load_meta(path)
+                if meta.get('generation') == generation:
+                    raise
+
+    @staticmethod
+    def _load(path, meta, only_meta, groupby, start, end, columns, mmap_mode, cache, resolution, agg):
+        if not only_meta and not groupby and not Sensor._migrated(path, meta):
+            meta = Sensor._migrate(path)
+
+        if columns is not None and not set(columns).issubset(meta.get('columns', [])):
+            raise KeyError(f"columns not found: {[col for col in columns if col not in meta.get('columns', [])]}")
+
         if only_meta:
             value = None
-        elif groupby:
-            value = pd.DataFrame()
-            for file in os.listdir(path):
-                if file.endswith('.pkl') and file != 'meta.pkl':
-                    with open(os.path.join(path, file), 'rb') as value_file:
-                        df = pickle.load(value_file)
-                        value = pd.concat([value, df])
+        elif resolution is not None:
+            if resolution not in (meta.get('rollups') or {}):
+                raise ValueError(f'rollup not found: {resolution}')
+            value = rollup.read(storage.data_dir(path, meta), resolution, meta['rollups'][resolution], columns=columns, agg=agg,
+                                start=start, end=end, mmap_mode=mmap_mode)
+        elif cache:
+            key = (os.path.abspath(path), os.stat(os.path.join(path, 'meta.pkl')).st_mtime_ns,
+                   groupby, start, end, None if columns is None else tuple(columns), mmap_mode)
+            value = value_cache.get(key, lambda: Sensor._read_value(path, meta, groupby, start, end, columns, mmap_mode))
         else:
-            with open(os.path.join(path, 'value.pkl'), 'rb') as value_file:
-                value = pickle.load(value_file)
-        
+            value = Sensor._read_value(path, meta, groupby, start, end, columns, mmap_mode)
+
         result = Sensor(meta, value)
         result.path = path
         return result
 
+    @staticmethod
+    def _read_value(path, meta, groupby, start, end, columns, mmap_mode):
+        if groupby:
+            # 여러 스레드로 shard를 읽고 한 번만 합칩니다.
+            shards = list(Sensor.iter_shards(path, start=start, end=end, columns=columns))
+            value = pd.concat(shards) if shards else pd.DataFrame()
+        else:
+            dir = storage.data_dir(path, meta)
+            log = storage.read_segment_log(dir)
+            base_columns = meta['columns'] if log is None else log['base']
+            value = storage.read_columns(os.path.join(dir, storage.VALUE_DIR), base_columns,
+                                         columns=Sensor._project(base_columns, columns), start=start, end=end, mmap_mode=mmap_mode,
+                                         schema=meta.get('schema'))
+            # append로 추가된 세그먼트를 순서대로 합칩니다.
+            # keep이 같은 연속된 세그먼트는 한 번의 _merge로 합쳐 누적된 value를 세그먼트마다 다시 복사하지 않습니다.
+            for keep, group in itertools.groupby((log or {'segments': []})['segments'], key=lambda segment: segment['keep']):
+                dfs = [storage.read_columns(os.path.join(dir, storage.SEGMENT_DIR, segment['name']), segment['columns'],
+                                            columns=Sensor._project(segment['columns'], columns), start=start, end=end,
+                                            mmap_mode=mmap_mode, schema=segment.get('schema'))
+                       for segment in group]
+                value = _merge(value, dfs, keep)
+            if log is not None:
+                value = value.reset_index(drop=True)
+        return value
+
+    @staticmethod
+    def iter_shards(path, start=None, end=None, columns=None, workers=None):
+        '''
+        groupby 센서 디렉토리의 shard(.pkl)를 파일 이름 순서대로 하나씩 반환하는 iterator 입니다.
+        workers개의 스레드가 미리 읽어두므로 전체를 메모리에 올리지 않고 shard 단위로 처리할 수 있습니다.
+
+        Args
+        ----
+        start, end, columns :
+            Sensor.load와 같습니다. shard마다 적용됩니다
+        workers : int
+            shard를 읽을 스레드 수, None이면 CPU 수
+        '''
+        files = sorted(os.path.join(path, file) for file in os.listdir(path) if file.endswith('.pkl') and file != 'meta.pkl')
+        workers = workers or os.cpu_count() or 1
+
+        def read(file):
+            with open(file, 'rb') as value_file:
+                df = pickle.load(value_file)
+            if start is not None or end is not None:
+                time = pd.to_datetime(df['time'])
+                mask = np.ones(len(df), dtype=bool)
+                if start is not None:
+                    mask &= (time >= pd.Timestamp(start)).to_numpy()
+                if end is not None:
+                    mask &= (time < pd.Timestamp(end)).to_numpy()
+                df = df[mask]
+            if columns is not None:
+                df = df[['time'] + [col for col in columns if col != 'time']]
+            return df
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 한꺼번에 제출하지 않고 workers * 2 개까지만 미리 읽습니다.
+            pending = deque()
+            for file in files:
+                pending.append(executor.submit(read, file))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    @staticmethod
+    def _project(names, columns):
+        # 요청한 열 중 이 파일에 있는 열만 읽습니다.
+        if columns is None:
+            return None
+        return [col for col in columns if col in names]
+
+    @staticmethod
+    def _migrate(path):
+        '''
+        예전 형식(value.pkl)의 센서 디렉토리를 열 단위 형식으로 변환하고 변환된 meta를 반환합니다.
+        같은 센서를 여러 곳에서 동시에 읽어도 한 번만 변환되도록 lock 안에서 다시 확인합니다.
+        다른 프로세스가 먼저 변환을 마쳐 value.pkl 이 없으면 그 결과를 그대로 씁니다.
+        '''
+        with _locked(path):
+            meta = Sensor._load_meta(path)
+            if Sensor._migrated(path, meta):
+                return meta
+            try:
+                with open(os.path.join(path, 'value.pkl'), 'rb') as value_file:
+                    value = pickle.load(value_file)
+            except FileNotFoundError:
+                return Sensor._load_meta(path)
+
+            meta = Sensor._summarize(meta, value)
+            Sensor._commit(path, meta, value, {})
+            return meta
+
+    @staticmethod
+    def _migrated(path, meta):
+        return 'columns' in meta and os.path.isdir(os.path.join(storage.data_dir(path, meta), storage.VALUE_DIR))
+
+    @staticmethod
+    def _commit(path, meta, value, rollups):
+        '''
+        value와 rollup을 새 세대 디렉토리에 모두 쓰고 나서 meta.pkl을 교체합니다. _locked 안에서 부릅니다.
+        meta.pkl 교체가 유일한 commit 지점이므로 그 전에 실패하면 meta.pkl과 이전 세대는 그대로 남습니다.
+        읽고 있는(memory-map 된) 세대의 디렉토리는 이름을 바꾸거나 덮어쓰지 않습니다.
+        commit 후 이전 세대와 예전 형식의 value.pkl, value/, rollup/, segments/ 를 지웁니다.
+
+        Args
+        ----
+        meta : dict
+            _summarize를 거친 meta, 'generation'과 'rollups'를 채워 저장합니다
+        rollups : dict[str, pd.DataFrame]
+            {freq: rollup.aggregate 결과}
+        '''
+        generation = storage.new_generation(path)
+        dir = os.path.join(path, generation)
+        try:
+            # value를 열 단위 .npy (또는 압축된 .z) 로 저장합니다.
+            storage.write_columns(os.path.join(dir, storage.VALUE_DIR), value, codec=meta.get('codec'))
+            meta['rollups'] = {freq: rollup.write(dir, freq, df, meta.get('codec')) for freq, df in rollups.items()}
+            meta['generation'] = generation
+            Sensor._dump_meta(path, meta)
+        except BaseException:
+            shutil.rmtree(dir, ignore_errors=True)
+            raise
+
+        # 이전 세대를 memory-map 한 캐시를 먼저 버려야 Windows에서도 지울 수 있습니다.
+        # 그래도 다른 곳에서 열고 있어 남은 세대는 다음 commit 때 다시 지웁니다.
+        value_cache.invalidate(path)
+        storage.remove_generations(path, generation, legacy=(storage.VALUE_DIR, rollup.ROLLUP_DIR, storage.SEGMENT_DIR))
+        try:
+            os.remove(os.path.join(path, 'value.pkl'))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _summarize(meta, value):
+        '''
+        catalog에서 value를 읽지 않고 쓸 수 있도록 열 이름, 행 수, 시간 범위, 열별 통계(stats.py)를 meta에 기록합니다.
+        value는 time 기준으로 정렬되어 있어야 합니다.
+        '''
+        meta['columns'] = list(value.columns)
+        meta['schema'] = storage.schema_of(value)
+        meta['length'] = len(value)
+        meta['time_range'] = (value['time'].iloc[0], value['time'].iloc[-1]) if len(value) else None
+        meta['stats'] = sensor_stats.describe(value)
+        return meta
+
+    @staticmethod
+    def _load_meta(path):
+        with open(os.path.join(path, 'meta.pkl'), 'rb') as meta_file:
+            return pickle.load(meta_file)
+
+    @staticmethod
+    def _dump_meta(path, meta):
+        # 읽는 쪽이 반쯤 쓴 meta.pkl을 보지 않도록 임시 파일에 쓰고 교체합니다.
+        meta_file = os.path.join(path, 'meta.pkl')
+        tmp_file = f'{meta_file}.tmp.{os.getpid()}.{threading.get_ident()}'
+        try:
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(meta, f)
+            os.replace(tmp_file, meta_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
     def __lt__(self, other):
         # 먼저 'category'를 기준으로 비교합니다.
         if self.category < other.category:
@@ -95,23 +588,32 @@ class Sensor:
         '''
         Args
         ----
-        df : pd.DataFrame
-            추가할 데이터프레임
+        df : pd.DataFrame or Sensor or list
+            추가할 데이터프레임, 리스트면 순서대로 한 번에 합칩니다
         keep : str
             'first' or 'last' 중 하나를 입력받습니다.
             'first'인 경우, 같은 시간 데이터가 있을 때 기존 데이터프레임을 유지합니다
             'last'인 경우, 같은 시간 데이터가 있을 때 덮어씁니다
         '''
-        if isinstance(other, Sensor):
+        if isinstance(other, (list, tuple)):
+            other = [o.value if isinstance(o, Sensor) else o for o in other]
+        elif isinstance(other, Sensor):
             other = other.value
 
-        self.value = pd.concat([self.value, other])
-        if keep is not None:
-            self.value = self.value.drop_duplicates(subset=['time'], keep=keep)
-        
-        self.value = self.value.sort_values(by='time')
+        pieces = [df for df in (other if isinstance(other, list) else [other]) if df is not None]
+        length = len(self.value) if self.value is not None else 0
+        self.value = _merge(self.value, other, keep)
         self.compress()
 
+        if self.meta.get('stats') is not None:
+            if len(self.value) == length + sum(len(df) for df in pieces):
+                for df in pieces:
+                    self.meta['stats'] = sensor_stats.merge(self.meta['stats'], sensor_stats.describe(df), length, len(df))
+                    length += len(df)
+            else:
+                # 중복이 지워졌으면 다시 계산합니다.
+                self.meta['stats'] = sensor_stats.describe(self.value)
+
     @property
     def name(self):
         return '_'.join([self.location, self.category, str(self.id)])
@@ -156,6 +658,13 @@ class Sensor:
     def longitude(self, value):
         self.meta['WGS84']['longitude'] = float(value)
 
+    @property
+    def stats(self):
+        '''
+        열별 통계 dict (stats.py), 저장된 적이 없거나 compact가 필요하면 None
+        '''
+        return self.meta.get('stats')
+
     def __repr__(self):
         return f"Sensor(location={self.location}, category={self.category}, id={self.id})"
     
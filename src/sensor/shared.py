@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import uuid
+from src.sensor import Sensor, storage
+
+
+class SharedSensorCache:
+    """
+    여러 프로세스가 같은 센서 value를 복사 없이 함께 쓰기 위한 캐시입니다.
+
+    부모 프로세스에서 publish로 센서의 열을 공유 디렉토리(리눅스는 /dev/shm, 메모리 파일 시스템)에 한 번 쓰고,
+    worker 프로세스는 attach로 memory-map 한 numpy 배열을 그대로 씁니다.
+    같은 파일을 map 하므로 worker 수가 늘어도 메모리는 한 벌만 사용합니다.
+    문자열(object) 열은 memory-map 할 수 없어 worker마다 따로 읽습니다.
+
+    SharedSensorCache 객체는 pickle 가능하므로 worker에 인자로 넘기면 됩니다.
+
+    ex)
+    with SharedSensorCache() as shared:
+        shared.publish(Sensor.load(rainfall_path))
+        with ProcessPoolExecutor() as executor:
+            executor.map(work, repeat(shared), road_ids)
+
+    def work(shared, road_id):
+        rainfall = shared.attach('401')
+    """
+    def __init__(self, dir=None):
+        if dir is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            dir = os.path.join(base, f'sensor-{uuid.uuid4().hex}')
+        self.dir = dir
+        self.owner = True
+        # id -> {'meta', 'columns', 'schema'}
+        self.manifest: dict[str, dict] = {}
+        os.makedirs(self.dir, exist_ok=True)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # worker에서는 공유 디렉토리를 지우지 않습니다.
+        state['owner'] = False
+        return state
+
+    def publish(self, sensor: Sensor, id=None):
+        '''
+        sensor.value를 공유 디렉토리에 쓰고 id(기본 sensor.id)로 등록합니다.
+        '''
+        id = str(sensor.id if id is None else id)
+        value = sensor.value
+        storage.write_columns(os.path.join(self.dir, id), value)
+        self.manifest[id] = {'meta': sensor.meta.copy(), 'columns': list(value.columns), 'schema': storage.schema_of(value)}
+        return id
+
+    def attach(self, id, start=None, end=None, columns=None):
+        '''
+        publish된 센서를 memory-map 한 value로 반환합니다. (copy-on-write 라서 수정해도 다른 프로세스에 영향이 없습니다)
+        '''
+        id = str(id)
+        if id not in self.manifest:
+            raise KeyError(f'sensor not published: {id}')
+        entry = self.manifest[id]
+        value = storage.read_columns(os.path.join(self.dir, id), entry['columns'], columns=columns,
+                                     start=start, end=end, mmap_mode='c', schema=entry['schema'])
+        return Sensor(entry['meta'].copy(), value)
+
+    def __contains__(self, id):
+        return str(id) in self.manifest
+
+    def close(self):
+        '''
+        공유 디렉토리를 지웁니다. publish한 프로세스에서만 지웁니다.
+        '''
+        if self.owner:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(latitude, longitude):
+    '''
+    위도, 경도(degree)를 단위 구 위의 3차원 좌표로 변환합니다.
+    두 점의 직선(chord) 거리는 haversine 거리와 단조 관계이므로 KD-tree로 최근접 탐색을 할 수 있습니다.
+    '''
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(np.asarray(km) / (2 * EARTH_RADIUS_KM))
+
+
+class SpatialIndex:
+    """
+    Sensor.meta['WGS84'] 로 만든 KD-tree, 거리는 haversine(km)입니다.
+    WGS84가 없는 센서는 제외됩니다.
+
+    ex)
+    index = SpatialIndex(getAllSensors('datasets/sensor/서울/강수량계'))
+    for road_sensor, (rainfall_sensor, km) in zip(road_sensors, index.nearest(road_sensors)):
+        ...
+    """
+    def __init__(self, sensors):
+        self.sensors = [sensor for sensor in sensors if 'WGS84' in sensor.meta]
+        if len(self.sensors) == 0:
+            raise ValueError('no sensor has WGS84')
+        self.tree = cKDTree(self._xyz(self.sensors))
+
+    @staticmethod
+    def _xyz(sensors):
+        return to_xyz([s.meta['WGS84']['latitude'] for s in sensors], [s.meta['WGS84']['longitude'] for s in sensors])
+
+    def query(self, targets, k=1):
+        '''
+        targets 각각에 대해 가까운 순서로 k개의 (인덱스, km) 배열을 반환합니다. shape = (len(targets), k)
+        '''
+        k = min(k, len(self.sensors))
+        chord, indices = self.tree.query(self._xyz(targets), k=k)
+        return np.asarray(indices).reshape(len(targets), k), chord_to_km(chord).reshape(len(targets), k)
+
+    def nearest(self, targets):
+        '''
+        가장 가까운 센서와 거리(km)를 반환합니다.
+        targets가 Sensor면 (Sensor, km), 리스트면 [(Sensor, km), ...]
+        '''
+        result = [pairs[0] for pairs in self.knearest(targets if isinstance(targets, list) else [targets], k=1)]
+        return result if isinstance(targets, list) else result[0]
+
+    def knearest(self, targets, k):
+        '''
+        가까운 순서로 k개의 [(Sensor, km), ...] 를 반환합니다. targets가 리스트면 target마다 리스트를 반환합니다.
+        '''
+        many = isinstance(targets, list)
+        indices, distances = self.query(targets if many else [targets], k=k)
+        result = [[(self.sensors[i], float(d)) for i, d in zip(row_i, row_d)] for row_i, row_d in zip(indices, distances)]
+        return result if many else result[0]
+
+    def within(self, targets, radius_km):
+        '''
+        radius_km 이내의 센서를 가까운 순서로 [(Sensor, km), ...] 반환합니다. targets가 리스트면 target마다 리스트를 반환합니다.
+        '''
+        many = isinstance(targets, list)
+        xyz = self._xyz(targets if many else [targets])
+        result = []
+        for point, indices in zip(xyz, self.tree.query_ball_point(xyz, r=float(km_to_chord(radius_km)))):
+            indices = np.asarray(indices, dtype=np.int64)
+            distances = chord_to_km(np.linalg.norm(self.tree.data[indices] - point, axis=1))
+            order = np.argsort(distances, kind='stable')
+            result.append([(self.sensors[indices[i]], float(distances[i])) for i in order])
+        return result if many else result[0]
@@ -0,0 +1,80 @@
+"""
+센서 열별 요약 통계입니다. save 시 meta['stats']에 저장되어 value를 읽지 않고 쓸 수 있습니다.
+
+    meta['stats'][열] = {'count', 'nan', 'min', 'max', 'mean', 'var'}
+count는 NaN이 아닌 값의 수, var는 모분산(ddof=0) 입니다. 숫자 열만 기록합니다.
+두 통계는 Chan의 병렬 분산 공식으로 합칠 수 있으므로 append / concat 시 전체를 다시 읽지 않습니다.
+"""
+import numpy as np
+import pandas as pd
+
+
+def is_numeric(series: pd.Series):
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def column_stats(series: pd.Series):
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = values[~np.isnan(values)]
+    count = len(valid)
+    if count == 0:
+        return {'count': 0, 'nan': len(values), 'min': None, 'max': None, 'mean': None, 'var': None}
+    return {
+        'count': count,
+        'nan': len(values) - count,
+        'min': float(valid.min()),
+        'max': float(valid.max()),
+        'mean': float(valid.mean()),
+        'var': float(valid.var()),
+    }
+
+
+def describe(value: pd.DataFrame):
+    '''
+    value의 숫자 열마다 column_stats를 계산합니다.
+    '''
+    return {col: column_stats(value[col]) for col in value.columns if col != 'time' and is_numeric(value[col])}
+
+
+def combine(a, b):
+    '''
+    두 구간의 column_stats를 하나로 합칩니다. (Chan et al.)
+    '''
+    if a is None or b['count'] == 0:
+        return None if a is None else {**a, 'nan': a['nan'] + b['nan']}
+    if a['count'] == 0:
+        return {**b, 'nan': a['nan'] + b['nan']}
+
+    n_a, n_b = a['count'], b['count']
+    n = n_a + n_b
+    delta = b['mean'] - a['mean']
+    m2 = a['var'] * n_a + b['var'] * n_b + delta ** 2 * n_a * n_b / n
+    return {
+        'count': n,
+        'nan': a['nan'] + b['nan'],
+        'min': min(a['min'], b['min']),
+        'max': max(a['max'], b['max']),
+        'mean': a['mean'] + delta * n_b / n,
+        'var': m2 / n,
+    }
+
+
+def merge(old, new, old_length, new_length):
+    '''
+    describe 결과 두 개를 열 단위로 합칩니다.
+    한쪽에만 있는 열은 다른 쪽 행 수만큼 NaN이었던 것으로 봅니다.
+
+    Args
+    ----
+    old : dict
+        기존 meta['stats'], None이면 None을 반환합니다
+    new : dict
+        추가된 데이터의 describe 결과
+    old_length, new_length : int
+        기존 / 추가된 데이터의 행 수
+    '''
+    if old is None:
+        return None
+    empty = lambda length: {'count': 0, 'nan': length, 'min': None, 'max': None, 'mean': None, 'var': None}
+    return {col: combine(old.get(col, empty(old_length)), new.get(col, empty(new_length)))
+            for col in list(old) + [col for col in new if col not in old]}
@@ -0,0 +1,320 @@
+import os
+import re
+import shutil
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from src.sensor import codec as sensor_codec
+
+
+VALUE_DIR = 'value'
+SEGMENT_DIR = 'segments'
+# save / compact 마다 새로 만드는 세대 디렉토리 이름, meta['generation']에 기록됩니다.
+GENERATION_PATTERN = re.compile(r'g(\d+)')
+
+
+LOCK_FILE = '.lock'
+
+
+@contextmanager
+def locked(path):
+    """
+    path/.lock 파일에 프로세스 사이의 배타 lock을 겁니다. 같은 프로세스의 다른 스레드와도 배타적이므로
+    한 스레드에서 겹쳐 잡지 않도록 Sensor._locked를 거쳐 씁니다.
+    """
+    with open(os.path.join(path, LOCK_FILE), 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                # LK_LOCK은 10번 기다린 뒤 OSError를 올리므로 잡을 때까지 다시 시도합니다.
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def data_dir(path, meta):
+    """
+    value/, rollup/, segments/ 가 있는 디렉토리, meta['generation']이 없는 예전 센서는 path 입니다.
+    """
+    generation = meta.get('generation')
+    return path if generation is None else os.path.join(path, generation)
+
+
+def new_generation(path):
+    """
+    path 안에 다음 세대 디렉토리를 만들고 이름을 반환합니다. locked(path) 안에서 부릅니다.
+    os.makedirs로 만들어 보고 이미 있으면 다음 번호를 쓰므로 실패한 쓰기가 남긴 디렉토리와 겹치지 않습니다.
+    """
+    numbers = [int(match.group(1)) for match in map(GENERATION_PATTERN.fullmatch, os.listdir(path)) if match]
+    number = max(numbers, default=0) + 1
+    while True:
+        generation = f'g{number:06d}'
+        try:
+            os.makedirs(os.path.join(path, generation))
+            return generation
+        except FileExistsError:
+            number += 1
+
+
+def remove_generations(path, keep, legacy=()):
+    """
+    keep보다 오래된 세대 디렉토리와 예전 형식의 legacy 디렉토리들을 지웁니다. locked(path) 안에서 부릅니다.
+    memory-map 되어 있어 지워지지 않는 파일(Windows)은 남겨두고 다음 번에 다시 지웁니다.
+    """
+    keep_number = int(GENERATION_PATTERN.fullmatch(keep).group(1))
+    for name in os.listdir(path):
+        match = GENERATION_PATTERN.fullmatch(name)
+        if (match and int(match.group(1)) < keep_number) or name in legacy:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def column_file(dir, index):
+    return os.path.join(dir, f'{index}.npy')
+
+
+def to_array(series: pd.Series, name=None):
+    """
+    pandas 열을 디스크에 저장할 numpy 배열로 변환합니다.
+    'time' 열은 int64 epoch(ns)로, category 열은 code로 저장합니다. (categories는 schema에 기록)
+    """
+    name = series.name if name is None else name
+    if name == 'time':
+        return pd.to_datetime(series).to_numpy(dtype='datetime64[ns]').view('int64')
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return np.ascontiguousarray(series.cat.codes.to_numpy())
+    array = series.to_numpy()
+    if array.dtype == object:
+        return array
+    return np.ascontiguousarray(array)
+
+
+def from_array(array, name, schema=None):
+    if name == 'time':
+        return array.view('datetime64[ns]')
+    column_schema = (schema or {}).get(name)
+    if column_schema is not None and column_schema['dtype'] == 'category':
+        return pd.Categorical.from_codes(np.asarray(array), categories=column_schema['categories'])
+    return array
+
+
+# float32로 바꿨을 때 이 자리수까지 같으면 float32를 사용합니다.
+FLOAT32_DECIMALS = 4
+# 고유값 비율이 이보다 작은 문자열 열은 category로 바꿉니다.
+CATEGORY_RATIO = 0.5
+
+
+def compact_array(series: pd.Series, name=None):
+    """
+    열 값에 맞는 작은 dtype을 골라 반환합니다.
+        time : datetime64[ns]
+        정수, 또는 결측치 없이 정수값만 있는 실수 : 값 범위에 맞는 가장 작은 정수형
+        실수 : 소수점 FLOAT32_DECIMALS 자리 이하의 값이고 float32로 그 자리까지 표현되면 float32
+        반복되는 문자열 : category
+    """
+    name = series.name if name is None else name
+    if name == 'time':
+        return pd.to_datetime(series).to_numpy(dtype='datetime64[ns]')
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.remove_unused_categories().array
+
+    if pd.api.types.is_bool_dtype(series.dtype) or len(series) == 0:
+        return series.to_numpy()
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        array = series.to_numpy()
+        if pd.api.types.is_float_dtype(array.dtype):
+            if not np.isnan(array).any() and np.array_equal(array, np.floor(array)):
+                return _smallest_int(array)
+            if array.dtype == np.float64:
+                # 값이 소수점 FLOAT32_DECIMALS 자리 이하이고, float32로 바꿔도 그 자리까지 같을 때만 바꿉니다.
+                rounded = np.round(array, FLOAT32_DECIMALS)
+                array32 = array.astype(np.float32)
+                if np.array_equal(rounded, array, equal_nan=True) and \
+                        np.array_equal(np.round(array32.astype(np.float64), FLOAT32_DECIMALS), rounded, equal_nan=True):
+                    return array32
+            return array
+        return _smallest_int(array)
+
+    if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        if series.dropna().map(type).eq(str).all() and series.nunique() <= len(series) * CATEGORY_RATIO:
+            return pd.Categorical(series.to_numpy())
+    return series.to_numpy()
+
+
+def _smallest_int(array):
+    lo, hi = array.min(), array.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return array.astype(dtype)
+    return array
+
+
+def schema_of(df: pd.DataFrame):
+    """
+    meta['schema']에 기록할 열별 dtype, category 열은 categories도 함께 기록합니다.
+    """
+    schema = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            schema[col] = {'dtype': 'category', 'categories': list(dtype.categories)}
+        else:
+            schema[col] = {'dtype': str(dtype)}
+    return schema
+
+
+def load_array(file, mmap_mode=None):
+    """
+    .npy 파일을 읽습니다. 문자열 같은 object 배열은 memory-map 할 수 없으므로 일반 로드로 대체합니다.
+    codec으로 압축된 파일(.z)이 있으면 압축을 풀어서 반환합니다.
+    """
+    compressed = os.path.splitext(file)[0] + sensor_codec.EXTENSION
+    if not os.path.exists(file) and os.path.exists(compressed):
+        return sensor_codec.load(compressed)
+    if mmap_mode is not None:
+        try:
+            return np.load(file, mmap_mode=mmap_mode)
+        except ValueError:
+            pass
+    return np.load(file, allow_pickle=True)
+
+
+def write_columns(dir, df: pd.DataFrame, codec=None):
+    """
+    DataFrame의 각 열을 dir/{열 번호}.npy 로 저장합니다.
+    열 이름과 순서는 meta['columns']에 기록되어 있어야 합니다.
+    임시 디렉토리에 모두 쓴 뒤 교체하므로 저장 중 실패해도 기존 데이터는 유지됩니다.
+    임시 디렉토리 이름에 프로세스/스레드 id를 붙이므로 여러 프로세스가 같은 dir에 써도 서로의 임시 파일을 지우지 않습니다.
+    이미 있는 dir은 이름을 바꿔 교체하므로, memory-map 되어 있을 수 있는 센서 value는 새 세대 디렉토리에 씁니다. (Sensor._commit)
+
+    codec이 'gorilla'면 codec.py로 압축해 dir/{열 번호}.z 로 저장합니다.
+    디스크 사용량과 cold load 시간은 줄지만 memory-map 할 수 없어 읽을 때 열 전체의 압축을 풉니다.
+    """
+    if codec not in (None, sensor_codec.CODEC):
+        raise ValueError(f'unknown codec: {codec}')
+    suffix = f'{os.getpid()}.{threading.get_ident()}'
+    tmp_dir = f'{dir}.tmp.{suffix}'
+    old_dir = f'{dir}.old.{suffix}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    try:
+        for i, col in enumerate(df.columns):
+            if codec is None:
+                np.save(column_file(tmp_dir, i), to_array(df[col], col), allow_pickle=True)
+            else:
+                sensor_codec.save(os.path.join(tmp_dir, f'{i}{sensor_codec.EXTENSION}'), to_array(df[col], col), col)
+
+        if os.path.isdir(dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+            os.replace(dir, old_dir)
+        os.replace(tmp_dir, dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    # 기존 파일이 memory-map 되어 있으면(Windows) 지워지지 않을 수 있으므로 무시합니다.
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def time_slice(time, start=None, end=None):
+    """
+    정렬된 time 배열(int64 epoch)에서 start <= time < end 구간의 (시작, 끝) 인덱스를 이진 탐색으로 찾습니다.
+    memory-map 된 배열이면 탐색에 필요한 페이지만 읽습니다.
+    """
+    lo = 0 if start is None else int(np.searchsorted(time, to_epoch(start), side='left'))
+    hi = len(time) if end is None else int(np.searchsorted(time, to_epoch(end), side='left'))
+    return lo, max(lo, hi)
+
+
+def to_epoch(t):
+    return pd.Timestamp(t).as_unit('ns').value
+
+
+def read_columns(dir, names, columns=None, start=None, end=None, mmap_mode='c', schema=None):
+    """
+    write_columns로 저장한 열들을 읽어 DataFrame으로 반환합니다.
+
+    Args
+    ----
+    dir : str
+        열 파일이 저장된 디렉토리
+    names : list[str]
+        저장된 순서대로의 열 이름 (meta['columns'])
+    columns : list[str]
+        읽을 열 이름, None이면 전부 읽습니다. 'time' 열은 항상 포함됩니다
+    start, end :
+        start <= time < end 구간만 읽습니다. None이면 처음/끝까지 읽습니다
+    mmap_mode : str
+        np.load의 mmap_mode, 'c'는 메모리에서만 수정 가능한 copy-on-write 입니다.
+        None이면 memory-map으로 열어 start ~ end 구간만 메모리로 복사하므로 읽는 양이 구간 크기에 비례합니다.
+    schema : dict
+        schema_of로 만든 열별 dtype, category 열을 복원할 때 씁니다
+    """
+    if columns is not None:
+        missing = [col for col in columns if col not in names]
+        if missing:
+            raise KeyError(f'columns not found: {missing}')
+
+    lo, hi = 0, None
+    if (start is not None or end is not None) and 'time' in names:
+        time = load_array(column_file(dir, names.index('time')), mmap_mode='r')
+        lo, hi = time_slice(time, start, end)
+        del time
+
+    result = {}
+    for i, name in enumerate(names):
+        if columns is not None and name != 'time' and name not in columns:
+            continue
+        if mmap_mode is None:
+            # 파일 전체를 읽지 않고 필요한 구간의 페이지만 복사합니다.
+            array = np.array(load_array(column_file(dir, i), mmap_mode='r')[lo:hi])
+        else:
+            array = load_array(column_file(dir, i), mmap_mode)[lo:hi]
+        result[name] = from_array(array, name, schema)
+    return pd.DataFrame(result, copy=False)
+
+
+def has_segments(path):
+    return os.path.exists(os.path.join(path, SEGMENT_DIR, 'log.pkl'))
+
+
+def read_segment_log(path):
+    """
+    append로 추가된 세그먼트 목록을 읽습니다.
+    {'base': 기본 value의 열 이름, 'segments': [{'name', 'columns', 'schema', 'keep'}, ...]}
+    세그먼트가 없으면 None을 반환합니다.
+    """
+    log_file = os.path.join(path, SEGMENT_DIR, 'log.pkl')
+    if not has_segments(path):
+        return None
+    with open(log_file, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_segment_log(path, log):
+    log_file = os.path.join(path, SEGMENT_DIR, 'log.pkl')
+    if log is None or len(log['segments']) == 0:
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        return
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    with open(log_file + '.tmp', 'wb') as f:
+        pickle.dump(log, f)
+    os.replace(log_file + '.tmp', log_file)
+
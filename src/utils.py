@@ -1,5 +1,8 @@
 import pandas as pd
 import os 
+import shelve
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.sensor import Sensor
 import requests
 from io import StringIO
@@ -37,9 +40,92 @@ def recalculate_accumulation(df, window_size):
     return result
 
 
-def get_lat_lon(address, api_key=None):
+# 주소 -> (위도, 경도) 캐시 파일 (shelve)
+GEOCODE_CACHE = os.path.join('datasets', 'cache', 'geocode')
+GEOCODE_WORKERS = 8
+
+
+def normalize_address(address):
+    '''
+    캐시 key로 쓰도록 앞뒤 공백을 지우고 연속된 공백을 하나로 합칩니다.
+    '''
+    return ' '.join(str(address).split())
+
+
+class GoogleGeocoder:
+    """
+    구글 Geocoding API backend 입니다. geocode의 backend는 address -> (위도, 경도) 인 함수면 무엇이든 됩니다.
+    """
+    URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+
+    def __init__(self, api_key=None, base_url=None):
+        self.api_key = api_key
+        self.base_url = base_url or GoogleGeocoder.URL
+        self.session = requests.Session()
+
+    def __call__(self, address):
+        params = {'address': address, 'key': self.api_key}
+        response = self.session.get(self.base_url, params=params, timeout=10)
+        results = response.json().get('results') if response.status_code == 200 else None
+        if results:
+            location = results[0]['geometry']['location']
+            return location['lat'], location['lng']
+        return None, None
+
+
+def geocode(addresses, api_key=None, backend=None, cache_file=GEOCODE_CACHE, workers=GEOCODE_WORKERS):
+    '''
+    여러 주소의 위도와 경도를 한꺼번에 구합니다.
+    cache_file에 있는 주소는 요청하지 않고, 없는 주소만 스레드 workers개로 동시에 요청해 찾는 대로 캐시에 저장합니다.
+    찾지 못했거나 backend가 예외를 올린 주소는 (None, None)으로 반환하고 캐시하지 않으므로 다음 호출 때 다시 요청합니다.
+
+    Args
+    ----
+    addresses : list[str]
+        주소
+    api_key : str
+        Google Map API 키, backend가 None일 때 씁니다
+    backend : callable
+        address -> (위도, 경도), 못 찾으면 (None, None). None이면 GoogleGeocoder(api_key)
+    cache_file : str
+        shelve 파일 경로, None이면 캐시를 쓰지 않습니다
+
+    Returns
+    -------
+    {주소: (위도, 경도)}
+    '''
+    keys = {address: normalize_address(address) for address in addresses}
+    found = {}
+    if cache_file is not None:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with shelve.open(cache_file) as cache:
+            found = {key: cache[key] for key in set(keys.values()) if key in cache}
+
+    missing = sorted(set(keys.values()) - found.keys())
+    if missing:
+        backend = backend or GoogleGeocoder(api_key)
+        # 중간에 멈추거나 일부가 실패해도 이미 찾은 주소는 남도록 끝나는 대로 하나씩 캐시에 씁니다.
+        # shelve는 스레드에 안전하지 않으므로 이 스레드에서만 씁니다.
+        with shelve.open(cache_file) if cache_file is not None else nullcontext({}) as cache, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(backend, key): key for key in missing}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    print(f"Error at {key}: {e}")
+                    continue
+                if value[0] is not None and value[1] is not None:
+                    cache[key] = value
+                    found[key] = value
+
+    return {address: found.get(key, (None, None)) for address, key in keys.items()}
+
+
+def get_lat_lon(address, api_key=None, backend=None):
     '''
-    구글 API를 이용하여 주소로부터 위도와 경도를 가져옵니다.
+    구글 API를 이용하여 주소로부터 위도와 경도를 가져옵니다. 한 번 찾은 주소는 캐시(GEOCODE_CACHE)에서 읽습니다.
     Args:
     ----
     address
@@ -47,12 +133,4 @@ def get_lat_lon(address, api_key=None):
     api_key
         Google Map API 키
     '''
-    base_url = 'https://maps.googleapis.com/maps/api/geocode/json'
-    params = {'address': address, 'key': api_key}
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        results = response.json().get('results')
-    if results:
-        location = results[0]['geometry']['location']
-        return location['lat'], location['lng']
-    return None, None
\ No newline at end of file
+    return geocode([address], api_key=api_key, backend=backend)[address]
@@ -1,7 +1,8 @@
 from src.widgets import *
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import Qt, pyqtSignal, QDir, QDirIterator, QFileInfo
-from src import Sensor
+from PyQt5.QtCore import Qt, pyqtSignal
+import os
+from src.sensor import Catalog
 
 
 class ExplorerWidget(QWidget):
@@ -56,40 +57,37 @@ class ExplorerWidget(QWidget):
                 if item in self.check_parentItem:
                     self.check_parentItem.remove(item)
 
-    def addItemsAndButtons(self, parentItem, path):
-        dirIterator = QDirIterator(path, QDir.Dirs | QDir.NoDotAndDotDot, QDirIterator.NoIteratorFlags)
-        hasSubdirectory = False
-        while dirIterator.hasNext():
-            hasSubdirectory = True
-            dirPath = dirIterator.next()
-            dirInfo = QFileInfo(dirPath)
-            if dirInfo.isDir():
-                childItem = QTreeWidgetItem(parentItem, [dirInfo.fileName()])
-                self.addItemsAndButtons(childItem, dirPath)
-
-        if not hasSubdirectory:
-            # 마지막 디렉토리인 경우
-            sensor = Sensor.load(path, only_meta=True)
-            checkboxgroup = checkboxGroup(sensor.meta['columns'], except_names=['time'])
-
-            parentItem.setData(0, Qt.UserRole, sensor)
-            parentItem.setData(1, Qt.UserRole, checkboxgroup)
-            
-            parentItem.setCheckState(0, Qt.Unchecked)
+    def addItemsAndButtons(self, rootItem, dir):
+        # catalog에서 센서 목록을 가져와 디렉토리 구조대로 항목을 만듭니다.
+        items = {(): rootItem}
+        for sensor in Catalog.load(dir).update().sensors():
+            parts = tuple(os.path.relpath(sensor.path, dir).replace(os.sep, '/').split('/'))
+            for i in range(1, len(parts) + 1):
+                if parts[:i] not in items:
+                    items[parts[:i]] = QTreeWidgetItem(items[parts[:i - 1]], [parts[i - 1]])
+            self.addSensorItem(items[parts], sensor)
+
+    def addSensorItem(self, parentItem, sensor):
+        checkboxgroup = checkboxGroup(sensor.meta['columns'], except_names=['time'])
+
+        parentItem.setData(0, Qt.UserRole, sensor)
+        parentItem.setData(1, Qt.UserRole, checkboxgroup)
+        
+        parentItem.setCheckState(0, Qt.Unchecked)
 
-            addButton = QPushButton('+')
-            addButton.setFixedSize(20, 20)
-            addButton.clicked.connect(lambda: self.emitAddButtonClicked(parentItem))
+        addButton = QPushButton('+')
+        addButton.setFixedSize(20, 20)
+        addButton.clicked.connect(lambda: self.emitAddButtonClicked(parentItem))
 
 
-            containerWidget = QWidget()
-            layout = QHBoxLayout(containerWidget)
-            layout.addWidget(addButton)
-            layout.addWidget(checkboxgroup)
-            layout.setContentsMargins(0, 0, 0, 0)
+        containerWidget = QWidget()
+        layout = QHBoxLayout(containerWidget)
+        layout.addWidget(addButton)
+        layout.addWidget(checkboxgroup)
+        layout.setContentsMargins(0, 0, 0, 0)
 
 
-            self.treeWidget.setItemWidget(parentItem, 1, containerWidget)
+        self.treeWidget.setItemWidget(parentItem, 1, containerWidget)
 
     def emitPlotOneGraphClicked(self):
         self.plotOneGraphClicked.emit()
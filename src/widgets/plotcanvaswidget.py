@@ -87,8 +87,13 @@ class PlotCanvasWidget(QWidget):
         self.graphWidget.setXRange(self.x_range[0], self.x_range[1], padding=0)
 
         # y 축 제대로 설정
-        all_y_values = np.concatenate([df.drop('time', axis=1).values.flatten() for df in dfs])
-        max_value, min_value = np.nanmax(all_y_values), np.nanmin(all_y_values)
+        # 센서 meta의 열별 통계(df.attrs['stats'])가 있으면 값을 모두 펼치지 않고 min / max를 구합니다.
+        y_stats = [df.attrs.get('stats', {}).get(col) for df in dfs for col in df.columns if col != 'time']
+        if y_stats and all(stat is not None and stat['count'] for stat in y_stats):
+            max_value, min_value = max(stat['max'] for stat in y_stats), min(stat['min'] for stat in y_stats)
+        else:
+            all_y_values = np.concatenate([df.drop('time', axis=1).values.flatten() for df in dfs])
+            max_value, min_value = np.nanmax(all_y_values), np.nanmin(all_y_values)
         padding = 0.02 * (max_value - min_value)
         self.y_range = [min_value - padding, max_value + padding]
         if self.y_range[0] == 0.0 and self.y_range[1] == 0.0:
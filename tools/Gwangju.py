@@ -2,9 +2,7 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-import pandas as pd
-from src.sensor import Sensor
-from src.utils import path2df
+from src.data.ingest import ingest_table
 
 
 # 파일 경로 리스트
@@ -15,37 +13,27 @@ file_paths = [
     'dataset/original/광주데이터/원데이터/지하차도.csv'
 ]
 
-dataframes = path2df(file_paths)
-
-
-for key, df in dataframes.items():
-    print(f"{key}:")
-    unique_msrins_nm = df['msrins_nm'].unique()
-    
-    for i in unique_msrins_nm:
-        fdf = df[df['msrins_nm'] == i]
-
-        print(fdf['obsr_unit_id'].unique(), fdf['obsr_item_nm'].unique(), fdf['msrins_nm'].unique())
-        
-
-        if key == '관로수위계':
-            key = '하수관로수위계'
-        elif key == '강우량계':
-            key = '강수량계'
-        elif key == '지하차도':
-            key = '지하차도수위계'
-        
-        value = fdf[['obsr_value', 'obsr_dt']].copy()
-       
-        value.rename(columns={'obsr_dt': 'time'}, inplace=True)
-        value['time'] = pd.to_datetime(value['time'])
-
-        meta = {
-                'location':'광주',
-                'category':key, 
-                'id':str(fdf['msrins_nm'].unique()[0]), 
-                'obsr_unit_id':int(fdf['obsr_unit_id'].unique()[0]), 
-                'obsr_item_nm':fdf['obsr_item_nm'].unique()[0]}
-        
-        obj = Sensor(meta, value)
-        obj.save()
+# 원본 파일 이름 -> 센서 category
+categories = {
+    '관로수위계': '하수관로수위계',
+    '강우량계': '강수량계',
+    '지하차도': '지하차도수위계',
+}
+
+
+def make_meta(id, category, row):
+    return {
+        'location':'광주',
+        'category':category,
+        'id':id,
+        'obsr_unit_id':int(row['obsr_unit_id']),
+        'obsr_item_nm':row['obsr_item_nm']}
+
+
+if __name__ == '__main__':
+    # 파일마다 msrins_nm 으로 한 번만 groupby 해서 datasets/sensor/광주/{category}/{id} 에 저장합니다.
+    ingest_table(file_paths, 'msrins_nm', 'datasets/sensor/광주', make_meta,
+                 categories=categories,
+                 rename={'obsr_dt': 'time'},
+                 columns=['obsr_value', 'time'],
+                 meta_columns=['obsr_unit_id', 'obsr_item_nm'])
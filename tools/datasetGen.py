@@ -6,7 +6,8 @@ import matplotlib.pyplot as plt
 from src.data import *
 import numpy as np
 import torch
-from src.sensor import getAllSensors, findNearestSensor
+import pandas as pd
+from src.sensor import Sensor, SpatialIndex, getAllSensors
 
 plt.rcParams['font.family'] = 'Malgun Gothic'
 plt.rcParams['axes.unicode_minus'] = False 
@@ -46,11 +47,18 @@ def main(minute_interval, rolling_windows, input_window_size, output_window_size
             10분 누적강수량 120분 평균이 1 이상인 데이터만 사용
     '''
     road_sensors = getAllSensors('datasets/sensor/서울/노면수위계2024', only_meta=False)
-    rainfall_sensors = getAllSensors('datasets/sensor/서울/강수량계', only_meta=False)
-
-    for road_sensor in road_sensors:
-        rainfall_sensor, min_distance = findNearestSensor(road_sensor, rainfall_sensors)
-        print(road_sensor.id, rainfall_sensor.id, min_distance)
+    rainfall_sensors = getAllSensors('datasets/sensor/서울/강수량계', only_meta=True)
+
+    # 모든 노면수위계의 가장 가까운 강수량계를 한 번에 찾습니다.
+    nearest = SpatialIndex(rainfall_sensors).nearest(road_sensors)
+
+    for road_sensor, (rainfall_sensor, distance_km) in zip(road_sensors, nearest):
+        print(road_sensor.id, rainfall_sensor.id, f'{distance_km:.3f}km')
+        # 노면수위계 기간 + 가장 긴 누적 구간만큼의 강수량만 읽습니다
+        rainfall_sensor = Sensor.load(rainfall_sensor.path,
+                                      start=road_sensor.value['time'].iloc[0] - pd.Timedelta(minutes=max(rolling_windows)),
+                                      end=road_sensor.value['time'].iloc[-1] + pd.Timedelta(minutes=1),
+                                      columns=['1분 누적강수량(mm)'])
 
         result = concat_road_rainfall(road_sensor, rainfall_sensor, minute_interval=minute_interval, rolling_windows=rolling_windows)
         missing_intervals = find_missing_intervals(road_sensor, hours=1)
@@ -0,0 +1,189 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import json
+import pickle
+import asyncio
+import argparse
+import tempfile
+import pandas as pd
+from aiohttp import web
+from src.sensor import Sensor
+from src.data.download import SEWER_SERVICE, SEWER_CHECKPOINT, RAINFALL_COLUMN, download_rainfall_async, download_sewer_async
+from src.data.sync import sync_rainfall, sync_sewer
+
+
+# 기상청 / 서울 열린데이터 api 응답 형식을 흉내내는 로컬 서버를 띄우고, base_url을 그 서버로 바꿔
+# downloader가 받은 행 수와 시간 범위를 확인합니다. api 키나 네트워크 없이 실행할 수 있습니다.
+# ex) python tools/replay.py
+parser = argparse.ArgumentParser()
+parser.add_argument('--port', type=int, default=8765, help='로컬 서버 포트')
+
+# 서버가 받은 (api, 구간 시작, 지점 또는 구) 기록
+seen = []
+# 0보다 크면 그 수만큼 하수관로 응답의 첫 row에서 MEA_WAL을 빼고 보냅니다 (깨진 페이지)
+broken = {'pages': 0}
+# 0보다 크면 그 수만큼 하수관로 요청에 ERROR-500을 보냅니다
+failing = {'pages': 0}
+# 기상청 api가 동시에 받고 있는 요청 수와 그 최댓값
+kma_load = {'now': 0, 'peak': 0}
+# 이 키로 보낸 하수관로 요청은 인증키 오류(INFO-100)를 받습니다
+BAD_KEY = 'bad'
+
+
+def kma_text(tm1, tm2, stn):
+    '''
+    nph-aws2_min(disp=1, help=2) 형식의 1분 자료, tm1 ~ tm2(포함)
+    '''
+    times = pd.date_range(pd.to_datetime(tm1, format='%Y%m%d%H%M'), pd.to_datetime(tm2, format='%Y%m%d%H%M'), freq='min')
+    lines = ['# YYMMDDHHMI STN WD1 WS1 WDS WSS WD10 WS10 TA RE RN-15m RN-60m RN-12H RN-DAY HM PA PS TD']
+    # RN-DAY는 매분 0.1mm씩 늘고 자정에 0부터 다시 셉니다.
+    lines += [f'{time:%Y%m%d%H%M},{stn},10.5,1.2,3,4,5,6,22.1,0,-99.0,0.5,1.0,{(time.hour * 60 + time.minute) * 0.1:.1f},60,1000.1,1010.2,12.0,='
+              for time in times]
+    return '\n'.join(lines) + '\n'
+
+
+def sewer_rows(area, start, end):
+    '''
+    구마다 센서 2개, 10분 간격의 DrainpipeMonitoringInfo row, start ~ end(포함, 시간 단위)
+    '''
+    times = pd.date_range(pd.to_datetime(start, format='%Y%m%d%H'), pd.to_datetime(end, format='%Y%m%d%H'), freq='10min')
+    return [{'IDN': f'{area}-{i:04d}', 'GUBN': area, 'MEA_YMD': f'{time:%Y-%m-%d %H:%M:%S.0}', 'MEA_WAL': 0.25 * i, 'SIG_STA': '통신양호'}
+            for time in times for i in (1, 2)]
+
+
+async def kma(request):
+    query = request.query
+    seen.append(('kma', query['tm1'], query['stn']))
+    kma_load['now'] += 1
+    kma_load['peak'] = max(kma_load['peak'], kma_load['now'])
+    try:
+        await asyncio.sleep(0.01)
+        return web.Response(text=kma_text(query['tm1'], query['tm2'], query['stn']))
+    finally:
+        kma_load['now'] -= 1
+
+
+async def sewer(request):
+    match = request.match_info
+    seen.append(('sewer', match['start'], match['area']))
+    if match['key'] == BAD_KEY:
+        return web.json_response({'RESULT': {'CODE': 'INFO-100', 'MESSAGE': '인증키가 유효하지 않습니다.'}})
+    if failing['pages'] > 0:
+        failing['pages'] -= 1
+        return web.json_response({'RESULT': {'CODE': 'ERROR-500', 'MESSAGE': '서버 오류입니다.'}})
+    rows = sewer_rows(match['area'], match['start'], match['end'])
+    if not rows:
+        return web.json_response({'RESULT': {'CODE': 'INFO-200', 'MESSAGE': '해당하는 데이터가 없습니다.'}})
+    first, last = int(match['first']), int(match['last'])
+    page = rows[first:last + 1]
+    if broken['pages'] > 0:
+        broken['pages'] -= 1
+        page = [{key: value for key, value in page[0].items() if key != 'MEA_WAL'}] + page[1:]
+    return web.json_response({SEWER_SERVICE: {'list_total_count': len(rows), 'RESULT': {'CODE': 'INFO-000', 'MESSAGE': '정상 처리되었습니다'},
+                                              'row': page}})
+
+
+async def serve(port):
+    '''
+    /kma 는 기상청, /{key}/json/DrainpipeMonitoringInfo/... 는 서울 열린데이터 api 입니다. 반환한 runner.cleanup()으로 닫습니다.
+    '''
+    app = web.Application()
+    app.router.add_get('/kma', kma)
+    app.router.add_get(f'/{{key}}/json/{SEWER_SERVICE}/{{first}}/{{last}}/{{area}}/{{start}}/{{end}}', sewer)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def check(port):
+    runner = await serve(port)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        # 2일 = 12시간 구간 4개
+        value = await download_rainfall_async('key', '202208080000', '202208100000', stn='401', base_url=f'{base_url}/kma')
+        assert len(value) == 2 * 24 * 60, len(value)
+        assert value['time'].is_monotonic_increasing and value['time'].is_unique
+        assert value['time'].iloc[0] == pd.Timestamp('2022-08-08 00:00') and value['time'].iloc[-1] == pd.Timestamp('2022-08-09 23:59')
+        assert value['RN-15m'].isna().all()
+        print('rainfall', len(value))
+
+        # 한 구간이 여러 페이지로 나뉘도록 8일 (2주) 을 받습니다. 필드가 빠진 페이지와 ERROR-500은 다시 받아야 합니다.
+        broken['pages'], failing['pages'] = 2, 2
+        value = await download_sewer_async('2024010100', '2024010823', 'key', base_url=base_url, areas=['01', '02'], backoff=0.01)
+        assert broken['pages'] == 0 and failing['pages'] == 0
+        rows = sum(len(sewer_rows(area, start, end)) for area in ['01', '02'] for start, end in [('2024010100', '2024010723'), ('2024010800', '2024010823')])
+        assert len(value) == rows, (len(value), rows)
+        assert sorted(value['IDN'].astype(str).unique()) == ['01-0001', '01-0002', '02-0001', '02-0002']
+        print('sewer', len(value))
+
+        with tempfile.TemporaryDirectory() as dir:
+            sensors = await download_sewer_async('2024010100', '2024010823', 'key', dir=dir, base_url=base_url, areas=['01', '02'])
+            assert sorted(str(sensor.id) for sensor in sensors) == ['01-0001', '01-0002', '02-0001', '02-0002']
+            assert sum(len(sensor.value) for sensor in sensors) == rows
+            print('sewer sensors', len(sensors))
+
+            # 인증키 오류는 데이터 없음으로 보고 checkpoint에 기록하지 않고 예외를 올려야 합니다.
+            bad_dir = os.path.join(dir, 'bad')
+            try:
+                await download_sewer_async('2024010100', '2024010823', BAD_KEY, dir=bad_dir, base_url=base_url, areas=['01'])
+            except RuntimeError as e:
+                print('sewer bad key', e)
+            else:
+                raise AssertionError('INFO-100 was not raised')
+            checkpoint = os.path.join(bad_dir, SEWER_CHECKPOINT)
+            assert not os.path.exists(checkpoint) or json.load(open(checkpoint))['done'] == [], open(checkpoint).read()
+
+        # sync는 asyncio.run을 부르므로 스레드에서 실행합니다.
+        await asyncio.to_thread(check_sync, base_url)
+    finally:
+        await runner.cleanup()
+
+
+def check_sync(base_url):
+    with tempfile.TemporaryDirectory() as dir:
+        # 예전 형식(meta.pkl + value.pkl) 센서도 catalog에서 마지막 시간을 찾아 이어 받아야 합니다.
+        path = os.path.join(dir, 'rain', '401')
+        os.makedirs(path)
+        with open(os.path.join(path, 'meta.pkl'), 'wb') as f:
+            pickle.dump({'location': '서울', 'category': '강수량계', 'id': '401'}, f)
+        with open(os.path.join(path, 'value.pkl'), 'wb') as f:
+            pickle.dump(pd.DataFrame({'time': pd.date_range('2024-01-01', periods=60, freq='min'), 'RN-15m': 0.0}), f)
+        added = sync_rainfall(os.path.join(dir, 'rain'), 'key', end='2024-01-01 03:00', base_url=f'{base_url}/kma')
+        assert added == {'401': 120}, added
+        value = Sensor.load(path, cache=False).value
+        assert len(value) == 180 and value['time'].is_unique, len(value)
+        # 이어 받은 구간에도 concat_road_rainfall이 읽는 1분 강수량 열이 채워져야 합니다.
+        assert (value[RAINFALL_COLUMN].iloc[60:] - 0.1).abs().max() < 1e-6, value[RAINFALL_COLUMN].iloc[58:63]
+        print('sync rainfall', added)
+
+        # 여러 지점을 받아도 동시에 보내는 요청은 concurrency개를 넘지 않아야 합니다.
+        for stn in ['402', '403', '404']:
+            Sensor({'location': '서울', 'category': '강수량계', 'id': stn},
+                   pd.DataFrame({'time': [pd.Timestamp('2024-01-01')], 'RN-15m': 0.0})).save(os.path.join(dir, 'rain', stn))
+        kma_load['peak'] = 0
+        added = sync_rainfall(os.path.join(dir, 'rain'), 'key', end='2024-01-03 00:00', base_url=f'{base_url}/kma', concurrency=2)
+        assert kma_load['peak'] <= 2 and len(added) == 4, (kma_load, added)
+        rain = Sensor.load(os.path.join(dir, 'rain', '402'), cache=False).value.set_index('time')[RAINFALL_COLUMN]
+        assert rain[pd.Timestamp('2024-01-02 00:00')] == 0 and (rain.iloc[1:].drop(pd.Timestamp('2024-01-02 00:00')) - 0.1).abs().max() < 1e-6
+        print('sync rainfall peak', kma_load['peak'], added)
+
+        # 구마다 마지막 시간부터 받고, 한 달 넘게 멈춘 01-0002는 시작 시간에 영향을 주지 않아야 합니다.
+        sewer_dir = os.path.join(dir, 'sewer')
+        for id, last in [('01-0001', '2024-01-05 12:00'), ('01-0002', '2023-12-01'), ('02-0001', '2024-01-06 12:00')]:
+            Sensor({'location': '서울', 'category': '하수관로수위계', 'id': id},
+                   pd.DataFrame({'time': pd.date_range(end=last, periods=6, freq='10min'), 'value': 0.0})).save(os.path.join(sewer_dir, id))
+        seen.clear()
+        sensors = sync_sewer(sewer_dir, 'key', end='2024-01-07 00:00', base_url=base_url)
+        starts = sorted({(start, area) for api, start, area in seen if api == 'sewer'})
+        assert starts == [('2024010512', '01'), ('2024010612', '02')], starts
+        assert Sensor.load(os.path.join(sewer_dir, '02-0001'), cache=False).value['time'].iloc[-1] == pd.Timestamp('2024-01-07 00:00')
+        print('sync sewer', len(sensors), starts)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    asyncio.run(check(args.port))
+    print('ok')
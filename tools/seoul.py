@@ -3,37 +3,34 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 import glob
+import itertools
 import pandas as pd
 from src.utils import *
 from src.sensor import *
+from src.data.ingest import ingest, save_sensors, read_chunks, stream_ingest, read_excel_cached
 
 
 def 강수량():
     csv_files = glob.glob("datasets/original/서울데이터/원데이터/강수량/*.csv")
 
-    # 불러온 파일 경로를 출력합니다.
-    df = path2df(csv_files, encoding='cp949')
-    df = pd.concat(df)
+    # 파일들을 프로세스 풀에서 읽어 지점별로 모은 뒤 한 번에 저장합니다.
+    chunks = ingest(csv_files, id_column='지점', rename={'일시': 'time'}, encoding='cp949')
 
-    print(df['지점'].unique())
-    meta = {
+    print(list(chunks))
+    make_meta = lambda id: {
         'location':'서울특별시 서초구 서초동 1416번지 서초 IC',
         'category':'강수량계',
-        'id':str(df['지점'].unique()[0]),
+        'id':id,
         'WGS84': {'latitude': 37.48462, 'longitude': 127.02601}
     }
-
-    value = df.drop('지점', axis=1)
-    value.rename(columns={'일시': 'time'}, inplace=True)
-    
-    obj = Sensor(meta, value)
-    obj.save(path=f'datasets/sensor/서울/강수량계/{obj.meta["id"]}')
+    save_sensors(chunks, make_meta, 'datasets/sensor/서울/강수량계')
 
 
 def 강수량append():
     import glob
     csv_files = glob.glob("datasets/original/서울데이터/강수량/**/*.csv")
-    sensors = getAllSensors('datasets/sensor/서울/강수량계', only_meta=False)
+    sensors = getAllSensors('datasets/sensor/서울/강수량계', only_meta=True)
+    index = SensorIndex(sensors)
 
     for csv_file in csv_files:
         print(csv_file)
@@ -48,59 +45,35 @@ def 강수량append():
 
         data['time'] = pd.to_datetime(data['time'])
         
-        sensor = searchSensors(sensors, id=sensor_id)
-        sensor.concat(data)
-        
-        sensor.save(sensor.path)
+        sensor = searchSensors(index, id=sensor_id)
+        # 추가된 행만 세그먼트로 저장합니다.
+        sensor.append(data)
+
+    for sensor in sensors:
+        sensor.compact()
 
 
 def 하수관로():
     csv_files = glob.glob("datasets/original/서울데이터/원데이터/하수관로/**/*.csv")
 
-    data_by_id: dict[str, Sensor]  = {}
-
-    for i in csv_files:
-        print(i)
-        try:
-            df = pd.read_csv(i, encoding='cp949')
-        except:
-            df = pd.read_csv(i, encoding='utf-8')
-
-        try:
-            grouped = df.groupby('고유번호')
-        except:
-            grouped = df.groupby('?고유번호')
-
-        for id, group in grouped:
-
-            meta = {
-                'location':'서울',
-                'category':'하수관로수위계',
-                'id':str(id),
-            }
-
-            value = group[['측정일자', '측정수위']].copy()
-            # rename 측정일자 -> time, 측정수위 -> value
-            value.rename(columns={'측정일자': 'time', '측정수위':'value'}, inplace=True)
-            obj = Sensor(meta, value)
-            if id in data_by_id:
-                # 고유번호가 이미 존재하면 데이터 합치기
-                data_by_id[id].concat(obj)
-            else:
-                # 새로운 고유번호면 딕셔너리에 추가
-                data_by_id[id] = obj
-
-            data_by_id[id].compress()
+    # 인코딩(cp949 / utf-8)은 파일마다 앞부분만 보고 정합니다.
+    chunks = ingest(csv_files, id_column='고유번호', rename={'측정일자': 'time', '측정수위': 'value'}, columns=['time', 'value'])
 
-    for i in data_by_id.values():
-        i.save(f'datasets/sensor/서울/하수관로수위계2/{i.id}')
+    make_meta = lambda id: {
+        'location':'서울',
+        'category':'하수관로수위계',
+        'id':id,
+    }
+    save_sensors(chunks, make_meta, 'datasets/sensor/서울/하수관로수위계2')
 
 
 def 하수관로위치업데이트(api_key=None):
     sewer_dir = 'datasets/sensor/서울/하수관로수위계'
 
-    sewer_meta = pd.read_excel('datasets/original/서울데이터/원데이터/하수관로/하수관로_메타정보.xlsx')
-    sensors = getAllSensors(sewer_dir, only_meta=False)
+    sewer_meta = read_excel_cached('datasets/original/서울데이터/원데이터/하수관로/하수관로_메타정보.xlsx')
+    sensors = SensorIndex(getAllSensors(sewer_dir, only_meta=False))
+    # 구글 API를 이용하여 위도와 경도를 한꺼번에 가져옵니다. 이미 찾은 주소는 캐시에서 읽습니다.
+    coordinates = geocode(sewer_meta['수위계 설치지점'].dropna().unique(), api_key)
 
     for index, row in sewer_meta.iterrows():
         matched_sensor = searchSensors(sensors, id=str(row['수위계번호']))
@@ -109,10 +82,8 @@ def 하수관로위치업데이트(api_key=None):
             address = row['수위계 설치지점']
             matched_sensor.meta['location'] = address
             matched_sensor.meta['box height(m)'] = row['박스높이(m)']
-            # 구글 API를 이용하여 위도와 경도를 가져옵니다.
 
-            
-            latitude, longitude = get_lat_lon(address, api_key)
+            latitude, longitude = coordinates.get(address, (None, None))
             if latitude and longitude:
                 matched_sensor.meta['WGS84'] = {'latitude': float(latitude), 'longitude': float(longitude)}
             else:
@@ -128,7 +99,8 @@ def 노면수위():
 
     csv_files = glob.glob("datasets/original/서울데이터/원데이터/노면수위/**/*.xlsm")
 
-    df = pd.read_excel(csv_files[-1], sheet_name='log', usecols="A:C", engine='openpyxl')
+    # 한 번 변환한 뒤에는 원본이 바뀌지 않는 한 엑셀을 다시 파싱하지 않습니다.
+    df = read_excel_cached(csv_files[-1], sheet_name='log', usecols="A:C", engine='openpyxl')
 
     grouped = df.groupby('id')
     for id, group in grouped:
@@ -147,37 +119,33 @@ def 노면수위():
 
 
 def 노면수위계2024():
-    df1 = pd.read_csv('datasets/original/서울데이터/노면수위/노면수위2024/TB_ROADWATERLEVELDATA.txt')
-    meta = pd.read_csv('datasets/original/서울데이터/노면수위/노면수위2024/TB_ROAD_FLOW_INFO.txt')
-    df2 = pd.read_csv('datasets/original/서울데이터/노면수위/노면수위2024/2305to10roadwaterlevelData_1min.csv')
-
-
-    df1 = df1.drop(columns=['IDX'])
-    df1.rename(columns={'DATA_TIME': 'time', 'DEVICE_ID': 'id', 'LEVEL_DATA':'value'}, inplace=True)
-
-    df2 = df2.drop(columns=['work_field_info_id', 'Unnamed: 0'])
-    df2.rename(columns={'device_id': 'id'}, inplace=True)
-
-    df = pd.concat([df1, df2])
-    
-    # df[df['value'] == 6].groupby('id').size()
-    grouped = df.groupby('id')
-    for i in grouped:
-        id, group = i
-        group = group.drop(columns=['id'])
-        meta_row = meta[meta['ROADGAUGE_CODE'] == id]
-
-        meta_row = meta_row.iloc[0]
-        meta_temp = {
+    dir = 'datasets/original/서울데이터/노면수위/노면수위2024'
+    meta = pd.read_csv(f'{dir}/TB_ROAD_FLOW_INFO.txt')
+    # ROADGAUGE_CODE -> meta 행
+    meta_index = {str(row['ROADGAUGE_CODE']): row for row in meta.drop_duplicates('ROADGAUGE_CODE').to_dict('records')}
+
+    def make_meta(id):
+        if id not in meta_index:
+            return None
+        meta_row = meta_index[id]
+        return {
             'location': meta_row['ADDRESS'],
             'category': '노면수위계2024',
-            'id': str(id),
+            'id': id,
             'WGS84': {'latitude': meta_row['GPS_LAT'], 'longitude': meta_row['GPS_LON']}
         }
-        sensor = Sensor(meta_temp, group)
-        sensor.save(f'datasets/sensor/서울/노면수위계2024/{sensor.id}')
 
-        
+    # 두 파일을 chunk 단위로 읽어 센서별로 나눠 씁니다. 파일 전체를 메모리에 올리지 않습니다.
+    chunks = itertools.chain(
+        (df.drop(columns=['IDX']) for df in read_chunks(f'{dir}/TB_ROADWATERLEVELDATA.txt',
+                                                          rename={'DATA_TIME': 'time', 'DEVICE_ID': 'id', 'LEVEL_DATA': 'value'})),
+        (df.drop(columns=['work_field_info_id', 'Unnamed: 0']) for df in read_chunks(f'{dir}/2305to10roadwaterlevelData_1min.csv',
+                                                                                    rename={'device_id': 'id'})),
+    )
+    # df[df['value'] == 6].groupby('id').size()
+    stream_ingest(chunks, 'id', make_meta, 'datasets/sensor/서울/노면수위계2024')
+
+
 if __name__ == '__main__':
     # 강수량()
     강수량append()
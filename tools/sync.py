@@ -0,0 +1,62 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import argparse
+import pandas as pd
+from src.data.download import KMA_URL, SEOUL_URL, backfill_rainfall
+from src.data.sync import sync_rainfall, sync_sewer
+
+
+# 저장된 센서의 마지막 시간 이후만 받아 append 합니다.
+# ex) python tools/sync.py rainfall --key {기상청 인증키}
+#     python tools/sync.py sewer --key {서울 열린데이터 API 키}
+# 처음 받는 지점은 backfill로 받습니다. backfill은 --since가 필요합니다.
+# ex) python tools/sync.py backfill --key {기상청 인증키} --stations 401 --since 202301010000
+# --since, --end는 'YYYYMMDDHHMM', 'YYYYMMDDHH', 'YYYYMMDD' 또는 '2023-01-01 00:00' 같은 시간 문자열을 받습니다.
+
+
+def parse_time(text):
+    # 숫자만 있으면 api 형식(YYYYMMDD[HH[MM]])으로, 아니면 pd.Timestamp로 읽습니다.
+    formats = {8: '%Y%m%d', 10: '%Y%m%d%H', 12: '%Y%m%d%H%M'}
+    try:
+        if text.isdigit():
+            if len(text) not in formats:
+                raise ValueError(text)
+            return pd.to_datetime(text, format=formats[len(text)])
+        return pd.Timestamp(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid time: {text}')
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('source', choices=['rainfall', 'sewer', 'backfill'],
+                    help='rainfall: 기상청 AWS, sewer: 서울 하수관로 수위, backfill: 기상청 AWS 지점 전체 기간')
+parser.add_argument('--key', required=True, help='API key')
+parser.add_argument('--dir', default=None, help='센서 디렉토리, 기본값은 source별 datasets/sensor/서울/...')
+parser.add_argument('--end', type=parse_time, default=None, help='받을 구간의 끝, 기본값은 현재 시각')
+parser.add_argument('--since', type=parse_time, default=None, help='저장된 값이 없는 센서의 시작 시간, backfill에서는 받을 구간의 시작')
+parser.add_argument('--base_url', default=None, help='API 주소 (테스트 서버 등)')
+parser.add_argument('--stations', nargs='+', default=['401'], help='backfill 할 기상청 지점 번호')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.source == 'backfill':
+        if args.since is None:
+            parser.error('backfill requires --since')
+        end = args.end if args.end is not None else pd.Timestamp.now().floor('min')
+        if args.since >= end:
+            parser.error('--since must be earlier than --end')
+        sensors = backfill_rainfall(args.dir or 'datasets/sensor/서울/강수량계', args.key, args.stations,
+                                    args.since.strftime('%Y%m%d%H%M'), end.strftime('%Y%m%d%H%M'), base_url=args.base_url or KMA_URL)
+        print(f'{len(sensors)} sensors updated')
+    elif args.source == 'rainfall':
+        added = sync_rainfall(args.dir or 'datasets/sensor/서울/강수량계', args.key, end=args.end, since=args.since,
+                              base_url=args.base_url or KMA_URL)
+        for id, n in added.items():
+            print(id, n)
+    else:
+        sensors = sync_sewer(args.dir or 'datasets/sensor/서울/하수관로수위계', args.key, end=args.end, since=args.since,
+                             base_url=args.base_url or SEOUL_URL)
+        print(f'{len(sensors)} sensors updated')
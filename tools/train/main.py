@@ -15,7 +15,7 @@ from src.models.convtran.loss import get_loss_module
 from src.models.convtran.utils import load_model
 from src.models.convtran.analysis import str_confusion_matrix
 from Training import SupervisedTrainer, train_runner
-from src.sensor import Sensor, getAllSensors, findNearestSensor
+from src.sensor import Sensor, SpatialIndex, getAllSensors
 from src.data import *
 
 logger = logging.getLogger('__main__')
@@ -86,6 +86,7 @@ if __name__ == '__main__':
     device = Initialization(config)
     
     rainfall_sensors = getAllSensors(args.rainfall_path, only_meta=True)
+    rainfall_index = SpatialIndex(rainfall_sensors)
 
     # label_output_time_axes multiple input handling
     label_output_time_axes = config['label_output_time_axis']
@@ -107,8 +108,12 @@ if __name__ == '__main__':
             logger.info("Loading Data ...")
 
             road_sensor = Sensor.load(f'{args.data_path}/{sensor_id}', only_meta=False)
-            rainfall_sensor, min_distance = findNearestSensor(road_sensor, rainfall_sensors)
-            rainfall_sensor = Sensor.load(rainfall_sensor.path, only_meta=False)
+            rainfall_sensor, distance_km = rainfall_index.nearest(road_sensor)
+            # 노면수위계 기간 + 가장 긴 누적 구간만큼의 강수량만 읽습니다
+            rainfall_sensor = Sensor.load(rainfall_sensor.path,
+                                          start=road_sensor.value['time'].iloc[0] - pd.Timedelta(minutes=max(args.rolling_windows)),
+                                          end=road_sensor.value['time'].iloc[-1] + pd.Timedelta(minutes=1),
+                                          columns=['1분 누적강수량(mm)'])
 
             data, label = process_sensor_data(road_sensor, 
                                             rainfall_sensor, 
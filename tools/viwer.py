@@ -68,15 +68,11 @@ class MainWidget(QMainWindow):
         dfs = []
         for item in items:
             sensor = item.data(0, Qt.UserRole)
-            if sensor.value is None:
-                #reload sensor with value
-                sensor = Sensor.load(sensor.path)
-                item.setData(0, Qt.UserRole, sensor)
-            
             checked = item.data(1, Qt.UserRole).get()
-            checked.append('time')
-            df = sensor.value[checked]
+            # 체크된 열만 읽습니다
+            df = Sensor.load(sensor.path, columns=checked).value
             df.name = sensor.path
+            df.attrs['stats'] = sensor.stats or {}
             dfs.append(df)
 
         canvas = PlotCanvasWidget(